@@ -0,0 +1,101 @@
+"""
+Peak memory of encoding a mail attachment, in memory vs. spooled to disk.
+
+Every measurement runs in a fresh subprocess, the increase of the
+maximum resident set size during encoding is reported.
+
+    $ poetry run python benchmarks/attachment_memory.py --sizes 1 10 50
+"""
+
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+
+import common
+
+common.configure_environment()
+
+
+def max_rss_mb():
+    # ru_maxrss is in kilobytes on linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def measure(mode, size_mb):
+    from flask_mail import Attachment, Message
+    from werkzeug.datastructures import FileStorage
+
+    from member_database import Config, create_app
+    from member_database.mail.spool import spool_message, spool_uploads
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+
+        class BenchmarkConfig(Config):
+            MAIL_SPOOL_DIR = tmpdir
+            LOG_FILE = None
+
+        app = create_app(BenchmarkConfig)
+
+        # werkzeug keeps large uploads in a temporary file, so do we
+        upload = os.path.join(tmpdir, "upload.pdf")
+        with open(upload, "wb") as f:
+            for _ in range(size_mb):
+                f.write(os.urandom(1024**2))
+
+        with app.app_context(), open(upload, "rb") as stream:
+            msg = Message(
+                subject="Benchmark",
+                sender="sender@example.org",
+                recipients=["organizer@example.org"],
+                body="Anbei die Unterlagen",
+            )
+            f = FileStorage(
+                stream, filename="upload.pdf", content_type="application/pdf"
+            )
+
+            before = max_rss_mb()
+            if mode == "memory":
+                msg.attachments = [
+                    Attachment(
+                        filename=f.filename, content_type=f.mimetype, data=f.read()
+                    )
+                ]
+                message = msg.as_bytes()
+                del message
+            else:
+                spool_message(msg, spool_uploads([f]))
+            after = max_rss_mb()
+
+    print(f"{after - before:.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=common.description(__doc__))
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 5, 10, 25, 50])
+    parser.add_argument("--child", nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        measure(args.child[0], int(args.child[1]))
+        return
+
+    print(f"{'attachment':>10} | {'in memory':>10} | {'spooled':>10}")
+    for size in args.sizes:
+        results = []
+        for mode in ("memory", "spooled"):
+            output = subprocess.run(
+                [sys.executable, __file__, "--child", mode, str(size)],
+                check=True,
+                capture_output=True,
+                text=True,
+            ).stdout
+            results.append(float(output.strip().splitlines()[-1]))
+
+        print(f"{size:>7} MB | {results[0]:>7.1f} MB | {results[1]:>7.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
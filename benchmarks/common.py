@@ -0,0 +1,23 @@
+"""
+Shared setup of the benchmark scripts, import it from the scripts
+in this directory as ``common``.
+"""
+
+import os
+
+
+def configure_environment():
+    """Set the environment the configuration requires, before importing the app"""
+    # they are not used by the benchmarks
+    for key in ("SECRET_KEY", "MAIL_SENDER", "MAIL_USERNAME", "MAIL_PASSWORD"):
+        os.environ.setdefault(key, "benchmark")
+    os.environ.setdefault("MAIL_SERVER", "localhost")
+    os.environ.setdefault("MAIL_PORT", "25")
+    os.environ.setdefault("APPROVE_MAIL", "approve@example.org")
+    os.environ.setdefault("ADMIN_MAIL", "admin@example.org")
+    os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+
+def description(doc):
+    """The first paragraph of a module docstring, for the argument parser"""
+    return " ".join(doc.strip().split("\n\n")[0].split())
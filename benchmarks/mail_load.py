@@ -0,0 +1,164 @@
+"""
+Push registration and confirmation mails through the complete mail path.
+
+Registrations and confirmations are posted to the app, which puts the
+mails into the outbox, then the outbox is processed by the mail worker,
+either delivering to a local SMTP sink or into a Maildir.
+Reported are the throughput and the latency percentiles of the requests
+and of the mails from being queued until they were delivered.
+
+    $ poetry run python benchmarks/mail_load.py -n 2000 --connect-delay 0.05
+    $ poetry run python benchmarks/mail_load.py -n 2000 --backend maildir
+"""
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+import common
+
+common.configure_environment()
+
+from itsdangerous import URLSafeSerializer  # noqa: E402
+
+from member_database import (  # noqa: E402
+    Config,
+    create_app,
+    init_authentication_database,
+    init_event_database,
+    init_main_database,
+)
+from member_database.events import Event, EventRegistration  # noqa: E402
+from member_database.mail import OutboxMessage  # noqa: E402
+from member_database.mail.sink import SMTPSink  # noqa: E402
+from member_database.mail.worker import process_outbox  # noqa: E402
+from member_database.models import db  # noqa: E402
+
+
+def percentiles(values):
+    q = statistics.quantiles(values, n=100)
+    return f"p50 {q[49]:7.1f} ms, p90 {q[89]:7.1f} ms, p99 {q[98]:7.1f} ms"
+
+
+def report(name, n, duration, latencies):
+    print(
+        f"{name:>15}: {n:6d} in {duration:6.2f} s, {n / duration:7.1f}/s,"
+        f" {percentiles([1000 * latency for latency in latencies])}"
+    )
+
+
+def timed_requests(client, method, urls, **kwargs):
+    latencies = []
+    start = time.perf_counter()
+    for url, data in urls:
+        t0 = time.perf_counter()
+        ret = client.open(url, method=method, data=data, **kwargs)
+        latencies.append(time.perf_counter() - t0)
+        assert ret.status_code in (200, 302), ret.status_code
+    return time.perf_counter() - start, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=common.description(__doc__))
+    parser.add_argument("-n", "--n-registrations", type=int, default=1000)
+    parser.add_argument("--backend", choices=["smtp", "maildir"], default="smtp")
+    parser.add_argument("--connect-delay", type=float, default=0.0)
+    parser.add_argument("--batch-size", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir, SMTPSink(
+        connect_delay=args.connect_delay, keep_messages=False
+    ) as sink:
+
+        class BenchmarkConfig(Config):
+            SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmpdir}/benchmark.sqlite"
+            WTF_CSRF_ENABLED = False
+            MAIL_BACKEND = args.backend
+            MAIL_MAILDIR = os.path.join(tmpdir, "maildir")
+            MAIL_SERVER = sink.host
+            MAIL_PORT = sink.port
+            MAIL_USE_TLS = False
+            MAIL_USE_SSL = False
+            MAIL_USERNAME = None
+            MAIL_PASSWORD = None
+            LOG_FILE = None
+
+        app = create_app(BenchmarkConfig)
+        app.logger.setLevel("WARNING")
+
+        with app.app_context(), app.test_client() as client:
+            db.create_all()
+            init_authentication_database()
+            init_main_database()
+            init_event_database()
+            event = Event(
+                name="Benchmark",
+                registration_open=True,
+                registration_schema={
+                    "properties": {"semester": {"type": "integer"}},
+                },
+            )
+            db.session.add(event)
+            db.session.commit()
+
+            duration, latencies = timed_requests(
+                client,
+                "POST",
+                [
+                    (
+                        f"/events/{event.id}/registration/",
+                        {
+                            "name": f"User {i}",
+                            "email": f"user{i}@example.org",
+                            "semester": 1,
+                        },
+                    )
+                    for i in range(args.n_registrations)
+                ],
+            )
+            report("registrations", args.n_registrations, duration, latencies)
+
+            ts = URLSafeSerializer(app.config["SECRET_KEY"], salt="registration-key")
+            registrations = db.session.execute(
+                db.select(EventRegistration.person_id, EventRegistration.id)
+            ).all()
+            duration, latencies = timed_requests(
+                client,
+                "GET",
+                [
+                    (f"/events/registration/{ts.dumps(tuple(ids))}/", None)
+                    for ids in registrations
+                ],
+            )
+            report("confirmations", len(registrations), duration, latencies)
+            db.session.remove()
+
+            n_mails = db.session.scalar(db.select(db.func.count(OutboxMessage.id)))
+            start = time.perf_counter()
+            while process_outbox(
+                batch_size=args.batch_size, concurrency=args.concurrency
+            ):
+                db.session.remove()
+            duration = time.perf_counter() - start
+
+            # time from queuing a mail until it was delivered
+            latencies = [
+                (sent_at - created_at).total_seconds()
+                for created_at, sent_at in db.session.execute(
+                    db.select(OutboxMessage.created_at, OutboxMessage.sent_at).where(
+                        OutboxMessage.status == OutboxMessage.SENT
+                    )
+                )
+            ]
+            report("queued -> sent", len(latencies), duration, latencies)
+            if len(latencies) != n_mails:
+                print(f"{n_mails - len(latencies)} mails were not delivered")
+            if args.backend == "smtp":
+                print(f"{sink.n_connections} SMTP connections")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Time to build the registration form class of an event, compiled from the
+json schema on every request vs. taken from the form cache.
+
+    $ poetry run python benchmarks/registration_form.py -n 1000
+"""
+
+import argparse
+import time
+
+import common
+
+common.configure_environment()
+
+from wtforms.fields import StringField  # noqa: E402
+from wtforms.validators import DataRequired  # noqa: E402
+
+from member_database import Config, create_app  # noqa: E402
+from member_database.events import create_email_field  # noqa: E402
+from member_database.events.common_schemata import (  # noqa: E402
+    ABSOLVENTENFEIER,
+    TOOLBOX,
+)
+from member_database.events.json_forms import (  # noqa: E402
+    cached_wtf_form,
+    create_wtf_form,
+    form_cache,
+)
+
+
+def additional_fields():
+    return {
+        "name": StringField("Name", [DataRequired()]),
+        "email": create_email_field(force_tu_mail=True),
+    }
+
+
+def uncached(schema):
+    return create_wtf_form(schema, additional_fields=additional_fields())
+
+
+def cached(schema):
+    return cached_wtf_form(
+        schema, key=("registration", True), additional_fields=additional_fields
+    )
+
+
+def run(build, schema, n):
+    form_cache.clear()
+    start = time.perf_counter()
+    for _ in range(n):
+        # the form is instantiated on every request in both cases
+        build(schema)()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=common.description(__doc__))
+    parser.add_argument("-n", type=int, default=1000, help="Forms per schema")
+    args = parser.parse_args()
+
+    class BenchmarkConfig(Config):
+        LOG_FILE = None
+        WTF_CSRF_ENABLED = False
+
+    app = create_app(BenchmarkConfig)
+
+    with app.test_request_context():
+        for name, schema in (
+            ("ABSOLVENTENFEIER", ABSOLVENTENFEIER),
+            ("TOOLBOX", TOOLBOX),
+        ):
+            t_uncached = run(uncached, schema, args.n)
+            t_cached = run(cached, schema, args.n)
+            print(
+                f"{name:<16} uncached: {1e6 * t_uncached / args.n:8.1f} µs/request"
+                f"  cached: {1e6 * t_cached / args.n:8.1f} µs/request"
+                f"  speedup: {t_uncached / t_cached:.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Compare one SMTP connection per mail with batched delivery.
+
+Runs against a local SMTP sink, use --connect-delay to simulate
+the TLS handshake and login of a real relay.
+
+    $ poetry run python benchmarks/smtp_batch.py -n 1000 --connect-delay 0.05
+"""
+
+import argparse
+import time
+
+from flask_mail import Message
+
+import common
+
+common.configure_environment()
+
+from member_database import Config, create_app  # noqa: E402
+from member_database.mail import mail  # noqa: E402
+from member_database.mail.sink import SMTPSink  # noqa: E402
+from member_database.mail.smtp import send_batch  # noqa: E402
+
+
+def make_envelopes(n):
+    envelopes = []
+    for i in range(n):
+        msg = Message(
+            subject=f"Benchmark {i}",
+            sender="sender@example.org",
+            recipients=[f"user{i}@example.org"],
+            body="Bitte bestätige deine Anmeldung\n" * 20,
+        )
+        envelopes.append((msg.sender, list(msg.send_to), msg.as_bytes()))
+    return envelopes
+
+
+def one_connection_per_mail(envelopes):
+    for envelope in envelopes:
+        with mail.connect() as connection:
+            connection.host.sendmail(*envelope)
+
+
+def batched(envelopes, max_per_connection):
+    errors = send_batch(envelopes, max_per_connection=max_per_connection)
+    assert all(e is None for e in errors)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=common.description(__doc__))
+    parser.add_argument("-n", "--n-mails", type=int, default=500)
+    parser.add_argument("--connect-delay", type=float, default=0.0)
+    parser.add_argument("--max-per-connection", type=int, default=100)
+    args = parser.parse_args()
+
+    with SMTPSink(connect_delay=args.connect_delay, keep_messages=False) as sink:
+
+        class BenchmarkConfig(Config):
+            MAIL_SERVER = sink.host
+            MAIL_PORT = sink.port
+            MAIL_USE_TLS = False
+            MAIL_USE_SSL = False
+            MAIL_USERNAME = None
+            MAIL_PASSWORD = None
+            LOG_FILE = None
+
+        app = create_app(BenchmarkConfig)
+
+        with app.app_context():
+            envelopes = make_envelopes(args.n_mails)
+
+            for name, func, kwargs in [
+                ("one connection per mail", one_connection_per_mail, {}),
+                (
+                    f"batched, {args.max_per_connection} per connection",
+                    batched,
+                    {"max_per_connection": args.max_per_connection},
+                ),
+            ]:
+                n_connections = sink.n_connections
+                start = time.perf_counter()
+                func(envelopes, **kwargs)
+                duration = time.perf_counter() - start
+
+                print(
+                    f"{name:>35}: {duration:6.2f} s"
+                    f", {len(envelopes) / duration:8.1f} mails/s"
+                    f", {sink.n_connections - n_connections} connections"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -7,6 +7,7 @@ from flask_bootstrap import Bootstrap4
 from flask_migrate import Migrate
 from sqlalchemy import event
 from sqlalchemy.engine import Engine
+from werkzeug.middleware.proxy_fix import ProxyFix
 
 from .admin_views import create_admin_views
 from .authentication import auth, init_authentication_database, login
@@ -16,6 +17,7 @@ from .events import events, init_event_database
 from .json import JSONEncoderISO8601
 from .log import setup_logging
 from .mail import mail
+from .mail.cli import mail_cli
 from .main import init_main_database, main
 from .models import db
 
@@ -36,6 +38,12 @@ def create_app(config=Config):
     app = Flask(__name__)
     app.config.from_object(config)
 
+    x_for = app.config.get("PROXY_FIX_X_FOR", 0)
+    x_proto = app.config.get("PROXY_FIX_X_PROTO", 0)
+    if x_for or x_proto:
+        # use the client address and scheme seen by the reverse proxy
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=x_for, x_proto=x_proto)
+
     db.init_app(app)
     mail.init_app(app)
     login.init_app(app)
@@ -51,6 +59,8 @@ def create_app(config=Config):
     app.register_blueprint(main)
     app.register_blueprint(events, url_prefix="/events")
 
+    app.cli.add_command(mail_cli)
+
     app.json_provider_class = JSONEncoderISO8601
 
     app.register_error_handler(401, unauthorized_error)
@@ -9,6 +9,7 @@ from wtforms.fields import PasswordField
 
 from .authentication import ACCESS_LEVELS, AccessLevel, Role, User, handle_needs_login
 from .events import Event, EventRegistration
+from .events.json_forms import validator_cache
 from .models import Person, TUStatus, db
 
 
@@ -59,6 +60,7 @@ class EventView(AuthorizedView):
     column_list = [
         "name",
         "notify_email",
+        "notification_mode",
         "max_participants",
         "force_tu_mail",
         "registration_open",
@@ -71,12 +73,24 @@ class EventView(AuthorizedView):
         "registration_open",
         "notify_email",
     ]
-    form_excluded_columns = ["registrations"]
+    form_excluded_columns = [
+        "registrations",
+        # maintained automatically, see events.counters
+        "n_confirmed",
+        "n_pending",
+        "n_waitinglist",
+        "n_canceled",
+        "version",
+    ]
     column_editable_list = ["name", "registration_open", "shortlink"]
     column_descriptions = {
         "description": "Description shown above on the registration page. HTML is allowed in this field.",
         "footer": "Additional text to be shown below the form on the registration page. HTML is allowed in this field.",
         "shortlink": 'Makes event available via "events/{shortlink}".',
+        "notification_mode": "Send a mail to notify_email for every registration or collect them into a digest mail.",
+    }
+    form_choices = {
+        "notification_mode": [(mode, mode) for mode in Event.NOTIFICATION_MODES]
     }
     form_widget_args = {
         "description": {
@@ -90,6 +104,10 @@ class EventView(AuthorizedView):
     }
     form_overrides = {"registration_schema": PrettyJSONField}
 
+    def on_model_change(self, form, event, is_created):
+        # drop validators of schemas that might not be used anymore
+        validator_cache.clear()
+
 
 class RoleView(AuthorizedView):
     column_display_pk = True
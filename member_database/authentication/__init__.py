@@ -89,6 +89,7 @@ def send_password_reset():
             return redirect(url_for("auth.send_password_reset"))
 
         send_password_reset_mail(user.person)
+        db.session.commit()
 
         flash("Password reset email sent", "success")
         return redirect("/")
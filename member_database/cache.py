@@ -0,0 +1,184 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import event
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from .models import CacheVersion, db
+
+log = logging.getLogger(__name__)
+
+_missing = object()
+
+
+class TTLCache:
+    """
+    Thread-safe mapping with a maximum size and an optional time to live.
+
+    When full, the least recently used entry is evicted.
+    Entries older than `ttl` seconds are treated as missing.
+    """
+
+    def __init__(self, maxsize=1024, ttl=None, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, key):
+        entry = self._data.get(key, _missing)
+        if entry is _missing:
+            return _missing
+
+        value, expires = entry
+        if expires is not None and expires <= self.clock():
+            del self._data[key]
+            return _missing
+
+        self._data.move_to_end(key)
+        return value
+
+    def _set(self, key, value):
+        expires = None if self.ttl is None else self.clock() + self.ttl
+        self._data[key] = (value, expires)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def get(self, key, default=None):
+        with self._lock:
+            value = self._get(key)
+        return default if value is _missing else value
+
+    def set(self, key, value):
+        with self._lock:
+            self._set(key, value)
+
+    def add(self, key, value=True):
+        """Store `value` only if `key` is missing, returns whether it was stored"""
+        with self._lock:
+            if self._get(key) is not _missing:
+                return False
+            self._set(key, value)
+            return True
+
+    def pop(self, key, default=None):
+        with self._lock:
+            value = self._get(key)
+            self._data.pop(key, None)
+        return default if value is _missing else value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __contains__(self, key):
+        with self._lock:
+            return self._get(key) is not _missing
+
+    def __len__(self):
+        return len(self._data)
+
+
+class VersionedCache:
+    """
+    Cache for data derived from the database that is valid as long as
+    the `CacheVersion` row `name` does not change.
+
+    The version is read from the database at most every `check_interval`
+    seconds, so changes made by other processes are visible after that time,
+    changes committed by this process immediately (see `invalidate`).
+    Entries are additionally dropped after `ttl` seconds, if given.
+    Without a version row, nothing is cached.
+    """
+
+    def __init__(
+        self, name, maxsize=128, ttl=None, check_interval=1.0, clock=time.monotonic
+    ):
+        self.name = name
+        self.check_interval = check_interval
+        self.clock = clock
+        self.data = TTLCache(maxsize=maxsize, ttl=ttl, clock=clock)
+        self.version = None
+        self.checked = None
+        _versioned_caches.setdefault(name, []).append(self)
+
+    def current_version(self):
+        now = self.clock()
+        if self.checked is None or now - self.checked >= self.check_interval:
+            version = db.session.scalar(
+                db.select(CacheVersion.version).filter_by(name=self.name)
+            )
+            if version != self.version:
+                self.data.clear()
+                self.version = version
+            self.checked = now
+        return self.version
+
+    def get_or_set(self, key, create):
+        """Return the cached value for `key` or store the result of `create()`"""
+        version = self.current_version()
+        if version is None:
+            return create()
+
+        value = self.data.get((version, key), _missing)
+        if value is _missing:
+            value = create()
+            self.data.set((version, key), value)
+        return value
+
+    def expire(self):
+        """Check the version on the next access"""
+        self.checked = None
+
+
+_versioned_caches = {}
+
+
+def invalidate(session, name):
+    """
+    Increment the version `name` once the transaction of `session` is
+    committed and expire the caches of this process.
+
+    The version is incremented in its own short transaction, so the hot
+    version row is not locked for the whole transaction of `session`.
+    """
+    session.info.setdefault("invalidated_caches", set()).add(name)
+
+
+def increment_versions(bind, names):
+    table = CacheVersion.__table__
+    with bind.begin() as connection:
+        for name in sorted(names):
+            connection.execute(
+                table.update()
+                .where(table.c.name == name)
+                .values(version=table.c.version + 1)
+            )
+
+
+@event.listens_for(Session, "after_commit")
+def expire_invalidated(session):
+    names = session.info.pop("invalidated_caches", ())
+    if not names:
+        return
+
+    try:
+        increment_versions(session.get_bind(CacheVersion), names)
+    except SQLAlchemyError:
+        # the data is committed anyway, other processes only see the
+        # change after the ttl of their entries or the next invalidation
+        log.exception("Could not increment cache versions %s", sorted(names))
+
+    for name in names:
+        for cache in _versioned_caches.get(name, ()):
+            cache.expire()
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def discard_invalidated(session, previous_transaction):
+    session.info.pop("invalidated_caches", None)
@@ -31,12 +31,80 @@ class Config:
     MAIL_USERNAME = os.environ["MAIL_USERNAME"]
     MAIL_PASSWORD = os.environ["MAIL_PASSWORD"]
 
+    # reconnect to the mail server after this many messages
+    MAIL_MAX_EMAILS = int(os.getenv("MAIL_MAX_EMAILS", 100))
+
+    # the outbox worker (flask mail worker) delivering the queued mails
+    MAIL_WORKER_BATCH_SIZE = int(os.getenv("MAIL_WORKER_BATCH_SIZE", 50))
+    MAIL_WORKER_CONCURRENCY = int(os.getenv("MAIL_WORKER_CONCURRENCY", 4))
+    MAIL_WORKER_POLL_INTERVAL = float(os.getenv("MAIL_WORKER_POLL_INTERVAL", 5))
+    # failed deliveries are retried after 30, 60, 120 ... seconds
+    MAIL_MAX_TRIES = int(os.getenv("MAIL_MAX_TRIES", 12))  # max waiting time: 1.4 days
+    MAIL_RETRY_FACTOR = float(os.getenv("MAIL_RETRY_FACTOR", 30))
+    # maximum number of messages per second sent by one worker, 0 to disable
+    MAIL_RATE_LIMIT = float(os.getenv("MAIL_RATE_LIMIT", 0))
+    # mails to many recipients (e.g. all participants) are split into chunks
+    MAIL_BCC_CHUNK_SIZE = int(os.getenv("MAIL_BCC_CHUNK_SIZE", 50))
+    # identical mails (e.g. resent confirmation mails) are only sent once
+    # within this many seconds, 0 to disable
+    MAIL_DEDUPE_WINDOW = int(os.getenv("MAIL_DEDUPE_WINDOW", 10 * 60))
+    # delivery of the mail worker: smtp, maildir, console or an import path,
+    # see member_database.mail.backends
+    MAIL_BACKEND = os.getenv("MAIL_BACKEND", "smtp")
+    MAIL_MAILDIR = os.getenv("MAIL_MAILDIR", os.path.abspath("maildir"))
+    # attachments of mass mails are stored here until they are sent,
+    # needs to be shared by the web app and the mail worker
+    MAIL_SPOOL_DIR = os.getenv("MAIL_SPOOL_DIR", os.path.abspath("mail_spool"))
+    # messages claimed longer ago are considered lost by a crashed worker
+    MAIL_CLAIM_TIMEOUT = int(os.getenv("MAIL_CLAIM_TIMEOUT", 10 * 60))
+
     LOG_FILE = os.environ.get("LOG_FILE")
+    # bearer token to access /metrics, disabled if not set
+    METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+    # log records waiting for the file and mail handlers, dropped when full
+    # and counted in the log_records_dropped_total metric
+    LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", 1000))
+    # errors are mailed to ADMIN_MAIL once, repeats are collected and
+    # sent as one digest mail every this many seconds
+    ERROR_MAIL_DIGEST_INTERVAL = int(os.getenv("ERROR_MAIL_DIGEST_INTERVAL", 15 * 60))
 
     # who gets a notification when there is a new membership application
     APPROVE_MAIL = os.environ["APPROVE_MAIL"]
+    # collect these notifications into one digest mail
+    APPROVE_MAIL_DIGEST = os.getenv("APPROVE_MAIL_DIGEST", "").lower() == "true"
+    # digest mails are sent once the oldest notification is this many seconds old
+    NOTIFICATION_DIGEST_INTERVAL = int(os.getenv("NOTIFICATION_DIGEST_INTERVAL", 3600))
     ADMIN_MAIL = os.environ["ADMIN_MAIL"].split(",")
 
     TOKEN_MAX_AGE = os.environ.get("TOKEN_MAX_AGE", 30 * 60)  # 30 minutes default
 
+    # limits for the unauthenticated endpoints resending confirmation mails,
+    # requests per hour, 0 to disable
+    RESEND_LIMIT_PER_ADDRESS = int(os.getenv("RESEND_LIMIT_PER_ADDRESS", 5))
+    RESEND_LIMIT_PER_IP = int(os.getenv("RESEND_LIMIT_PER_IP", 30))
+
+    # number of reverse proxies in front of the app that set X-Forwarded-For
+    # and X-Forwarded-Proto, the client address used for the limits is taken
+    # from these headers. 0 ignores the headers, only set this behind a proxy
+    PROXY_FIX_X_FOR = int(os.getenv("PROXY_FIX_X_FOR", 0))
+    PROXY_FIX_X_PROTO = int(os.getenv("PROXY_FIX_X_PROTO", 0))
+
+    # registration submits processed concurrently per event and worker
+    # process, 0 to disable. Further submits wait in order, up to
+    # REGISTRATION_QUEUE_SIZE of them for REGISTRATION_QUEUE_TIMEOUT seconds,
+    # the rest is asked to retry after REGISTRATION_RETRY_AFTER seconds.
+    # The limit only has an effect if a process handles several requests at
+    # once, run.sh starts gunicorn with GUNICORN_THREADS threads per process,
+    # so it should be lower than that. Sync workers are never limited.
+    REGISTRATION_CONCURRENCY = int(os.getenv("REGISTRATION_CONCURRENCY", 0))
+    REGISTRATION_QUEUE_SIZE = int(os.getenv("REGISTRATION_QUEUE_SIZE", 20))
+    REGISTRATION_QUEUE_TIMEOUT = float(os.getenv("REGISTRATION_QUEUE_TIMEOUT", 5))
+    REGISTRATION_RETRY_AFTER = int(os.getenv("REGISTRATION_RETRY_AFTER", 10))
+
+    # caching of the public event json, e.g. by the website, in seconds
+    EVENT_CACHE_MAX_AGE = int(os.getenv("EVENT_CACHE_MAX_AGE", 10))
+    EVENT_STALE_WHILE_REVALIDATE = int(os.getenv("EVENT_STALE_WHILE_REVALIDATE", 60))
+    # browsers may cache the answers to CORS preflight requests this long
+    CORS_MAX_AGE = int(os.getenv("CORS_MAX_AGE", 24 * 3600))
+
     LANGUAGES = ["de", "en"]
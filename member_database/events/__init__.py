@@ -1,37 +1,68 @@
+import io
 import logging
 from datetime import datetime, timezone
 from functools import wraps
 
+import click
 from flask import (
     Blueprint,
+    Response,
     abort,
     current_app,
     flash,
+    get_flashed_messages,
     jsonify,
     redirect,
     render_template,
     request,
+    session,
+    stream_template,
+    stream_with_context,
     url_for,
 )
-from flask_babel import _
+from flask_babel import _, get_locale, lazy_gettext
 from flask_cors import cross_origin
 from flask_login import current_user
-from flask_mail import Attachment
-from flask_wtf import FlaskForm
 from itsdangerous import BadData, URLSafeSerializer
-from jsonschema import ValidationError, validate
-from sqlalchemy import func
-from sqlalchemy.orm import joinedload
-from wtforms.fields import EmailField, StringField, SubmitField
+from jsonschema import ValidationError
+from sqlalchemy.orm import joinedload, selectinload
+from wtforms.fields import EmailField, StringField
 from wtforms.validators import DataRequired, Regexp
 
 from ..authentication import access_required
-from ..mail import send_email
-from ..models import Person, as_dict, db
-from ..utils import ext_url_for, get_or_create, table_exists
-from .forms import SendMailForm
-from .json_forms import create_wtf_form
+from ..mail import send_email, send_mass_email, send_notification
+from ..mail.spool import spool_uploads
+from ..models import CacheVersion, Person, as_dict, db
+from ..ratelimit import admission_gate, hourly_limit
+from ..utils import ext_url_for, get_or_create, read_only, table_exists
+from .forms import ImportForm, ResendForm, SendMailForm
+from .imports import import_registrations, read_registrations
+from .json_forms import cached_wtf_form, validate
+from .metrics import registrations_shed
+from .cache import (
+    VERSION,
+    cached_event,
+    event_id_for_shortlink,
+    event_values,
+    index_cache,
+)
+from .counters import lock_event, recount
+from .export import (
+    BATCH_SIZE,
+    chunked,
+    generate_csv,
+    generate_ndjson,
+    iter_participants,
+    schema_columns,
+)
 from .models import Event, EventRegistration, RegistrationStatus
+from .pagination import (
+    MAX_LIMIT,
+    ORDER,
+    after_cursor,
+    encode_cursor,
+    parse_datetime,
+)
 
 __all__ = [
     "events",
@@ -54,7 +85,8 @@ def create_email_field(force_tu_mail=False):
         mail_validators.append(
             Regexp(
                 regex,
-                message=_(
+                # the field is cached, translate when rendering
+                message=lazy_gettext(
                     "Bitte nutze deine UniMail-Adresse im Format vorname.nachname@tu-dortmund.de"
                 ),
             )
@@ -79,38 +111,108 @@ def init_event_database():
 
     for name in RegistrationStatus.STATES:
         get_or_create(RegistrationStatus, name=name)
+    if table_exists(CacheVersion):
+        get_or_create(CacheVersion, name=VERSION)
     db.session.commit()
 
 
+@events.cli.command("recount")
+@click.option("--dry-run", is_flag=True, help="Only report wrong counters.")
+def recount_command(dry_run):
+    """Verify and repair the number of registrations stored for each event."""
+    wrong = recount(dry_run=dry_run)
+    if dry_run:
+        db.session.rollback()
+    else:
+        db.session.commit()
+
+    for event_id in wrong:
+        click.echo(f"Wrong registration counts for event {event_id}")
+    if dry_run:
+        click.echo(f"{len(wrong)} events have wrong counts")
+    else:
+        click.echo(f"Repaired {len(wrong)} events")
+
+
+@events.cli.command("import")
+@click.argument("event")
+@click.argument("file", type=click.File("r", encoding="utf-8-sig"))
+@click.option(
+    "--status",
+    type=click.Choice(["confirmed", "pending", "waitinglist"]),
+    default="confirmed",
+    show_default=True,
+    help="Status of the imported registrations.",
+)
+@click.option("--send-mail", is_flag=True, help="Send the confirmation mails.")
+def import_command(event, file, status, send_mail):
+    """Import registrations to EVENT (id or shortlink) from a csv file."""
+    # shortlinks may consist of digits only
+    event_id = event_id_for_shortlink(event)
+    if event_id is None and event.isdigit():
+        event_id = int(event)
+    event = db.session.get(Event, event_id) if event_id is not None else None
+    if event is None:
+        raise click.ClickException("No such event")
+
+    rows, errors = read_registrations(file, event.registration_schema)
+    if errors:
+        for error in errors:
+            click.echo(error, err=True)
+        raise click.ClickException(f"{len(errors)} errors, nothing was imported")
+
+    new_ids, n_waiting = import_registrations(event, rows, status_name=status)
+    db.session.commit()
+    click.echo(
+        f"Imported {len(new_ids)} registrations,"
+        f" {len(rows) - len(new_ids)} were already registered"
+    )
+    if n_waiting:
+        click.echo(f"{n_waiting} were put on the waiting list, the event is full")
+    if send_mail:
+        send_import_mails(new_ids)
+        db.session.commit()
+
+
+def send_import_mails(registration_ids):
+    registrations = db.session.scalars(
+        db.select(EventRegistration)
+        .where(EventRegistration.id.in_(registration_ids))
+        .options(joinedload(EventRegistration.person))
+    )
+    for registration in registrations:
+        if registration.person.email_valid is not False:
+            send_registration_mail(registration)
+
+
 @events.add_app_template_global
 def url_for_event(endpoint, event_id):
     """ "Returns the shortlink version of the url, if there is a shortlink."""
-    event = db.session.get(Event, event_id)
-    if event.shortlink is None:
+    event = event_values(event_id)
+    if event is None or event["shortlink"] is None:
         return url_for(endpoint, event_id=event_id)
-    return url_for(endpoint + "_via_shortlink", shortlink=event.shortlink)
+    return url_for(endpoint + "_via_shortlink", shortlink=event["shortlink"])
 
 
 @events.route("/")
 def index():
     """Index page for the event registration, provides a list with links to
     the registrations for currently open events"""
-    subquery = (
-        db.session.query(
-            EventRegistration.event_id, func.count("*").label("participants")
-        )
-        .filter_by(status_name="confirmed")
-        .group_by(EventRegistration.event_id)
-        .subquery()
-    )
+    # the page is the same for all anonymous users, unless there are messages
+    if not current_user.is_authenticated and "_flashes" not in session:
+        return index_cache.get_or_set(str(get_locale()), render_index)
+    return render_index()
+
+
+def render_index():
     query = db.session.query(
         Event.id,
         Event.name,
         Event.description,
         Event.max_participants,
         Event.registration_open,
-        func.coalesce(subquery.c.participants, 0).label("n_participants"),
-    ).join(subquery, Event.id == subquery.c.event_id, isouter=True)
+        Event.n_confirmed.label("n_participants"),
+    )
 
     # for logged in users, we want to show all events, all others
     # only get to see the ones that are currently open
@@ -140,11 +242,7 @@ def index():
 
 
 def get_n_participants(event):
-    return (
-        db.session.query(EventRegistration)
-        .filter_by(event_id=event.id, status_name="confirmed")
-        .count()
-    )
+    return event.n_confirmed
 
 
 def get_free_places(event):
@@ -154,6 +252,72 @@ def get_free_places(event):
     return None
 
 
+def waitlist_position(registration):
+    """Position of a registration on the waiting list of its event, starting at 1"""
+    return db.session.scalar(
+        db.select(db.func.count())
+        .select_from(EventRegistration)
+        .where(
+            EventRegistration.event_id == registration.event_id,
+            EventRegistration.status_name == "waitinglist",
+            db.or_(
+                EventRegistration.timestamp < registration.timestamp,
+                db.and_(
+                    EventRegistration.timestamp == registration.timestamp,
+                    EventRegistration.id <= registration.id,
+                ),
+            ),
+        )
+    )
+
+
+def promote_waiting(event):
+    """
+    Confirm the oldest registrations on the waiting list while there
+    are free places, returns the promoted registrations.
+    The event has to be locked, see `lock_event`.
+    """
+    promoted = []
+    while True:
+        # update the counters of the event
+        db.session.flush()
+        free_places = get_free_places(event)
+        if free_places is not None and free_places < 1:
+            break
+
+        registration = db.session.scalars(
+            db.select(EventRegistration)
+            .filter_by(event_id=event.id, status_name="waitinglist")
+            .order_by(EventRegistration.timestamp, EventRegistration.id)
+            .limit(1)
+        ).first()
+        if registration is None:
+            break
+
+        log.info(f"Promoting {registration} from the waiting list of {event}")
+        registration.status_name = "confirmed"
+        promoted.append(registration)
+
+    return promoted
+
+
+def send_confirmed_mail(registration):
+    person = registration.person
+    send_email(
+        subject=_("Anmeldung bestätigt: ") + registration.event.name,
+        sender=current_app.config["MAIL_SENDER"],
+        recipients=[person.email],
+        body=render_template(
+            "events/confirmed.txt",
+            name=person.name,
+            event=registration.event.name,
+            edit_link=ext_url_for(
+                "events.confirmation", token=registration_token(registration)
+            ),
+        ),
+    )
+
+
 def add_shortlink_route(route, **options):
     """
     Add a second route, transforming shortlink into id
@@ -162,8 +326,10 @@ def add_shortlink_route(route, **options):
     def route_name_to_id_decorator(func):
         @wraps(func)
         def call_with_id(shortlink):
-            event = db.one_or_404(db.select(Event).filter_by(shortlink=shortlink))
-            return func(event.id)
+            event_id = event_id_for_shortlink(shortlink)
+            if event_id is None:
+                abort(404)
+            return func(event_id)
 
         # have to rename the function, becauce flask has to have
         # unique id's on view_functions
@@ -175,10 +341,56 @@ def add_shortlink_route(route, **options):
     return route_name_to_id_decorator
 
 
+def admission_controlled(func):
+    """
+    Limit the number of concurrent POST requests per event to
+    ``REGISTRATION_CONCURRENCY``, excess requests wait in order or
+    are answered with 503 and Retry-After.
+    """
+
+    @wraps(func)
+    def wrapper(event_id):
+        config = current_app.config
+        limit = config["REGISTRATION_CONCURRENCY"]
+        if request.method != "POST" or not limit:
+            return func(event_id)
+
+        gate = admission_gate(
+            "registration", event_id, limit, config["REGISTRATION_QUEUE_SIZE"]
+        )
+        if not gate.acquire(timeout=config["REGISTRATION_QUEUE_TIMEOUT"]):
+            registrations_shed.inc()
+            log.warning(f"Too many concurrent registrations for event {event_id}")
+            return busy(event_id)
+
+        try:
+            return func(event_id)
+        finally:
+            gate.release()
+
+    return wrapper
+
+
+def busy(event_id):
+    event = cached_event(event_id)
+    if event is None:
+        abort(404)
+
+    retry_after = current_app.config["REGISTRATION_RETRY_AFTER"]
+    return (
+        render_template("events/busy.html", event=event, retry_after=retry_after),
+        503,
+        {"Retry-After": str(retry_after)},
+    )
+
+
 @events.route("/<int:event_id>/registration/", methods=["GET", "POST"])
 @add_shortlink_route("/<string:shortlink>/registration/", methods=["GET", "POST"])
+@admission_controlled
 def registration(event_id):
-    event = db.get_or_404(Event, event_id)
+    event = cached_event(event_id)
+    if event is None:
+        abort(404)
 
     free_places = get_free_places(event)
     if free_places is not None:
@@ -198,9 +410,10 @@ def registration(event_id):
             )
             return redirect(url_for("events.index"))
 
-    Form = create_wtf_form(
+    Form = cached_wtf_form(
         event.registration_schema,
-        additional_fields={
+        key=("registration", event.force_tu_mail),
+        additional_fields=lambda: {
             "name": StringField("Name", [DataRequired()]),
             "email": create_email_field(event.force_tu_mail),
         },
@@ -259,6 +472,7 @@ def registration(event_id):
 
             db.session.commit()
             send_registration_mail(registration)
+            db.session.commit()
         return redirect(url_for("events.index"))
     else:
         registration = None
@@ -273,27 +487,39 @@ def registration(event_id):
     )
 
 
-def send_registration_mail(registration):
-    event = registration.event
-    person = registration.person
-    ts = URLSafeSerializer(
+def registration_serializer():
+    return URLSafeSerializer(
         current_app.config["SECRET_KEY"],
         salt="registration-key",
     )
-    token = ts.dumps(
-        (person.id, registration.id),
+
+
+def registration_token(registration):
+    """Token for the links to edit or cancel a registration"""
+    return registration_serializer().dumps(
+        (registration.person_id, registration.id),
     )
+
+
+def send_registration_mail(registration):
+    event = registration.event
+    person = registration.person
+    token = registration_token(registration)
     if registration.status_name == "pending":
         subject = "Bestätige deine Anmeldung zu "
     else:
         subject = "Bearbeite deine Anmeldung zu "
 
-    send_email(
+    template = "events/confirmation.txt"
+    return send_email(
+        dedupe_key=(
+            f"{template}:{registration.id}:{registration.status_name}:{person.email}"
+        ),
         subject=_(subject) + event.name,
         sender=current_app.config["MAIL_SENDER"],
         recipients=[person.email],
         body=render_template(
-            "events/confirmation.txt",
+            template,
             name=person.name,
             event=event.name,
             confirmation_link=ext_url_for("events.confirmation", token=token),
@@ -302,12 +528,34 @@ def send_registration_mail(registration):
     )
 
 
+def resend_allowed(email):
+    """Rate limit resending mails per recipient and per client"""
+    config = current_app.config
+    if not hourly_limit(
+        "resend_ip", request.remote_addr, config["RESEND_LIMIT_PER_IP"]
+    ):
+        return False
+    return hourly_limit("resend_address", email, config["RESEND_LIMIT_PER_ADDRESS"])
+
+
+def too_many_resends(form):
+    flash(
+        "Zu viele Anfragen, bitte versuche es später noch einmal.",
+        category="danger",
+    )
+    return render_template("events/resend_emails.html", form=form), 429
+
+
 @events.route("/resend_email/", methods=["POST"])
 def resend_email():
     registration_id = request.form["registration_id"]
 
     registration = db.get_or_404(EventRegistration, registration_id)
+    if not resend_allowed(registration.person.email):
+        return too_many_resends(ResendForm(formdata=None))
+
     send_registration_mail(registration)
+    db.session.commit()
     flash("Email versendet", category="success")
 
     return redirect(url_for("events.index"))
@@ -316,20 +564,26 @@ def resend_email():
 @events.route("/resend_emails/", methods=["GET", "POST"])
 def resend_emails():
     """Resend all emails for open events for a given email address"""
-
-    class ResendForm(FlaskForm):
-        email = EmailField(validators=[DataRequired()])
-        submit = SubmitField("Emails für aktuelle Anmeldungen erneut versenden.")
-
     form = ResendForm()
 
     if form.validate_on_submit():
         email = request.form["email"]
+        if not resend_allowed(email):
+            return too_many_resends(form)
+
         person = Person.query.filter_by(email=email).first()
         if person is None:
             flash(f'Keine Veranstaltungs-Anmeldung für "{email}"', "danger")
             return redirect(url_for("events.index"))
 
+        if person.email_valid is False:
+            flash(
+                f'Emails an "{email}" konnten nicht zugestellt werden,'
+                " bitte wende dich an uns.",
+                "danger",
+            )
+            return redirect(url_for("events.index"))
+
         open_registrations = list(
             EventRegistration.query.filter_by(person=person)
             .join(Event)
@@ -341,6 +595,7 @@ def resend_emails():
 
         for registration in open_registrations:
             send_registration_mail(registration)
+        db.session.commit()
         flash("Emails versendet", category="success")
 
         return redirect(url_for("events.index"))
@@ -353,46 +608,200 @@ def resend_emails():
 @add_shortlink_route("/<string:shortlink>/")
 @cross_origin(origins=["https://([a-z]+.)?pep-dortmund.(org|de)"])
 def get_event(event_id):
-    event = Event.query.filter_by(id=event_id).first()
+    event = cached_event(event_id)
     if event is None:
         return jsonify(status_name="No such event"), 404
 
-    evt_info = as_dict(event)
-    evt_info["free_places"] = get_free_places(event)
+    etag = event_etag(event)
+    if request.if_none_match.contains(etag):
+        response = current_app.response_class(status=304)
+    else:
+        evt_info = as_dict(event)
+        evt_info["free_places"] = get_free_places(event)
+        response = jsonify(
+            status_name="success",
+            event=evt_info,
+        )
+
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = (
+        f"public, max-age={current_app.config['EVENT_CACHE_MAX_AGE']},"
+        f" stale-while-revalidate={current_app.config['EVENT_STALE_WHILE_REVALIDATE']}"
+    )
+    return response
+
 
-    return jsonify(
-        status_name="success",
-        event=evt_info,
+def event_etag(event):
+    """Changes with every change of the event and its registration counters"""
+    counters = "-".join(
+        str(getattr(event, f"n_{status}")) for status in RegistrationStatus.STATES
     )
+    return f"{event.id}-{event.version}-{counters}"
+
+
+@events.route("/<int:event_id>/participants.csv")
+@add_shortlink_route("/<string:shortlink>/participants.csv")
+@access_required("get_participants")
+def participants_csv(event_id):
+    event = cached_event(event_id)
+    if event is None:
+        abort(404)
+
+    rows = generate_csv(event.registration_schema, iter_participants(event_id))
+    return Response(
+        stream_with_context(rows),
+        mimetype="text/csv",
+        headers={
+            "Content-Disposition": f'attachment; filename="participants_{event_id}.csv"'
+        },
+    )
+
+
+@events.route("/<int:event_id>/participants.ndjson")
+@add_shortlink_route("/<string:shortlink>/participants.ndjson")
+@access_required("get_participants")
+def participants_ndjson(event_id):
+    if cached_event(event_id) is None:
+        abort(404)
+
+    rows = generate_ndjson(iter_participants(event_id))
+    return Response(stream_with_context(rows), mimetype="application/x-ndjson")
 
 
 @events.route("/<int:event_id>/participants/")
 @add_shortlink_route("/<string:shortlink>/participants/")
 @access_required("get_participants")
 def participants(event_id):
-    event = db.get_or_404(Event, event_id)
+    event = cached_event(event_id)
+    if event is None:
+        abort(404)
+
+    if "application/json" in request.headers.get("Accept", ""):
+        return participants_json(event_id)
+
+    # the session is saved before the template is rendered,
+    # so remove the flashed messages now
+    get_flashed_messages()
+
+    # rows are fetched while the table is rendered and sent
     participants = db.session.scalars(
         db.select(EventRegistration)
         .filter_by(event_id=event_id)
-        .order_by(EventRegistration.timestamp.is_(None), EventRegistration.timestamp)
+        .order_by(*ORDER)
+        # one query for the persons of each batch
+        .options(selectinload(EventRegistration.person))
+        .execution_options(yield_per=BATCH_SIZE)
+    )
+    return Response(
+        chunked(
+            stream_template(
+                "events/participants.html", participants=participants, event=event
+            )
+        ),
+        mimetype="text/html",
+    )
+
+
+def participants_json(event_id):
+    """
+    Registrations of an event, optionally only those with one of the
+    given ``status_name`` or changed since ``changed_since``.
+    With ``limit``, at most ``limit`` registrations are returned and
+    ``next`` is the cursor to pass as ``after`` to get the next page.
+    """
+    query = (
+        db.select(EventRegistration)
+        .filter_by(event_id=event_id)
+        .order_by(*ORDER)
         .options(joinedload(EventRegistration.person))
     )
 
-    if "application/json" in request.headers.get("Accept", ""):
-        data = []
-        for p in participants:
-            d = as_dict(p)
-            # fill email from person if not present in data
-            d["data"]["email"] = d["data"].get("email", p.person.email)
-            data.append(d)
-
-        return jsonify(
-            status_name="success",
-            participants=data,
+    status_names = request.args.getlist("status_name")
+    if status_names:
+        query = query.where(EventRegistration.status_name.in_(status_names))
+
+    limit = None
+    try:
+        if "changed_since" in request.args:
+            changed_since = parse_datetime(request.args["changed_since"])
+            query = query.where(EventRegistration.updated_at >= changed_since)
+        if "after" in request.args:
+            query = query.where(after_cursor(request.args["after"]))
+        if "limit" in request.args:
+            limit = int(request.args["limit"])
+            if not 1 <= limit <= MAX_LIMIT:
+                raise ValueError(f"limit has to be between 1 and {MAX_LIMIT}")
+    except ValueError as e:
+        return jsonify(status_name=str(e)), 400
+
+    if limit is not None:
+        # one more to know if there is a next page
+        query = query.limit(limit + 1)
+    participants = db.session.scalars(query).all()
+
+    data = []
+    for p in participants[:limit]:
+        d = as_dict(p)
+        # fill email from person if not present in data
+        d["data"]["email"] = d["data"].get("email", p.person.email)
+        data.append(d)
+
+    if limit is None:
+        return jsonify(status_name="success", participants=data)
+
+    next_cursor = None
+    if len(participants) > limit:
+        next_cursor = encode_cursor(participants[limit - 1])
+    return jsonify(status_name="success", participants=data, next=next_cursor)
+
+
+@events.route("/<int:event_id>/import/", methods=["GET", "POST"])
+@add_shortlink_route("/<string:shortlink>/import/", methods=["GET", "POST"])
+@access_required("import_registrations")
+def import_participants(event_id):
+    event = db.get_or_404(Event, event_id)
+    form = ImportForm()
+
+    if form.validate_on_submit():
+        lines = io.TextIOWrapper(form.file.data.stream, encoding="utf-8-sig")
+        rows, errors = read_registrations(lines, event.registration_schema)
+        if errors:
+            for error in errors[:20]:
+                flash(error, "danger")
+            flash(f"{len(errors)} Fehler, es wurde nichts importiert", "danger")
+            return render_template(
+                "events/import.html",
+                event=event,
+                form=form,
+                columns=schema_columns(event.registration_schema),
+            )
+
+        new_ids, n_waiting = import_registrations(
+            event, rows, status_name=form.status.data
+        )
+        db.session.commit()
+        if form.send_mail.data:
+            send_import_mails(new_ids)
+            db.session.commit()
+
+        flash(
+            f"{len(new_ids)} Anmeldungen importiert,"
+            f" {len(rows) - len(new_ids)} waren bereits angemeldet",
+            "success",
         )
+        if n_waiting:
+            flash(
+                f"Die Veranstaltung ist voll, {n_waiting} Anmeldungen"
+                " wurden auf die Warteliste gesetzt",
+                "warning",
+            )
+        return redirect(url_for("events.participants", event_id=event_id))
 
     return render_template(
-        "events/participants.html", participants=participants, event=event
+        "events/import.html",
+        event=event,
+        form=form,
+        columns=schema_columns(event.registration_schema),
     )
 
 
@@ -415,28 +824,28 @@ def write_mail(event_id):
             joinedload(EventRegistration.person)
         ).filter_by(event_id=event_id, status_name="confirmed")
 
-        attachments = [
-            Attachment(
-                filename=f.filename,
-                data=data,
-                content_type=f.mimetype,
-            )
-            for f in request.files.getlist(form.attachments.name)
-            if f.filename != "" and len(data := f.read()) > 0
-        ]
+        # stream attachments to disk instead of keeping them in memory
+        attachments = spool_uploads(request.files.getlist(form.attachments.name))
 
-        # send to everyone in bcc
-        bcc = [f"{p.person.name} <{p.person.email}>" for p in participants]
+        # send to everyone in bcc, split into chunks to respect the
+        # recipient limits of the mail server
+        bcc = [
+            f"{p.person.name} <{p.person.email}>"
+            for p in participants
+            # mails to this address bounced
+            if p.person.email_valid is not False
+        ]
         reply_to = f"{form.name.data} <{form.email.data}>"
-        send_email(
+        send_mass_email(
             sender=current_app.config["MAIL_SENDER"],
             subject=form.subject.data,
             recipients=[reply_to],
             bcc=bcc,
             body=form.body.data,
             reply_to=reply_to,
-            attachments=attachments,
+            spooled_attachments=attachments,
         )
+        db.session.commit()
 
         flash("Mail send", "success")
         return redirect(url_for("events.index"))
@@ -449,27 +858,57 @@ def write_mail(event_id):
     )
 
 
-@events.route("/registration/<token>/", methods=["GET", "POST"])
-def confirmation(token):
-    ts = URLSafeSerializer(
-        current_app.config["SECRET_KEY"],
-        salt="registration-key",
-    )
+def load_registration(token):
+    """
+    The registration of a confirmation link together with its person and
+    event (including the registration counters) in one query.
+    Aborts with 404 for invalid links.
+    """
     try:
-        person_id, registration_id = ts.loads(token)
-    except BadData as e:
-        print(e)
+        person_id, registration_id = registration_serializer().loads(token)
+    except BadData:
+        abort(404)
+
+    registration = db.session.scalars(
+        db.select(EventRegistration)
+        .filter_by(id=registration_id, person_id=person_id)
+        .options(
+            # the membership relations of the person are not needed here
+            joinedload(EventRegistration.person).lazyload("*"),
+            joinedload(EventRegistration.event),
+        )
+    ).first()
+    if registration is None:
         abort(404)
+    return registration
 
-    person = db.session.get(Person, person_id)
-    registration = db.session.get(EventRegistration, registration_id)
+
+@events.route("/registration/<token>/", methods=["GET", "POST"])
+def confirmation(token):
+    registration = load_registration(token)
+    person = registration.person
     event = registration.event
-    n_participants = get_n_participants(event)
-    booked_out = event.max_participants and n_participants >= event.max_participants
 
     log.info(f"Confirmation for {event} by {person} ({registration})")
 
+    if request.method == "GET" and registration.status_name != "pending":
+        # revisiting the page does not change anything
+        read_only()
+
+    if request.method == "POST" and registration.status_name == "canceled":
+        flash("Deine Anmeldung ist bereits storniert", "warning")
+        return redirect(url_for("events.confirmation", token=token))
+
+    if registration.status_name == "pending":
+        # counting the participants and taking the seat has to be atomic,
+        # concurrent confirmations would overbook the event otherwise
+        lock_event(event.id)
+        db.session.refresh(registration)
+        db.session.refresh(event)
+
     if registration.status_name == "pending":
+        n_participants = get_n_participants(event)
+        booked_out = event.max_participants and n_participants >= event.max_participants
         if booked_out:
             registration.status_name = "waitinglist"
             subject = "Auf der Warteliste: "
@@ -484,6 +923,8 @@ def confirmation(token):
         registration.timestamp = datetime.now(timezone.utc)
 
         db.session.add(registration)
+        # release the lock before sending any mails
+        db.session.commit()
         flash(msg, category)
         send_email(
             subject=_(subject) + registration.event.name,
@@ -497,21 +938,22 @@ def confirmation(token):
             ),
         )
         if event.notify_email:
-            send_email(
+            send_notification(
+                recipient=event.notify_email,
                 subject=f'Neue Anmeldung für "{event.name}"',
-                sender=current_app.config["MAIL_SENDER"],
-                recipients=[event.notify_email],
-                body=render_template(
-                    "events/notification.txt",
-                    person=person,
-                    event=event,
-                    registration=registration,
-                ),
+                template="events/notification.txt",
+                digest_subject=f'Neue Anmeldungen für "{event.name}"',
+                digest=event.notification_mode == Event.DIGEST,
+                person=person,
+                event=event,
+                registration=registration,
             )
+        db.session.commit()
 
-    Form = create_wtf_form(
+    Form = cached_wtf_form(
         registration.event.registration_schema,
-        additional_fields={
+        key=("confirmation",),
+        additional_fields=lambda: {
             "name": StringField("Name", [DataRequired()]),
             "email": EmailField("Email", [DataRequired()], render_kw={"disabled": ""}),
         },
@@ -524,14 +966,49 @@ def confirmation(token):
             data.pop(key)
 
         registration.data = data
+        db.session.commit()
         flash("Anmeldung aktualisiert", "success")
 
     form.submit.label.text = "Speichern"
-    db.session.commit()
+
+    position = None
+    if registration.status_name == "waitinglist":
+        position = waitlist_position(registration)
+
     return render_template(
         "events/registration.html",
         form=form,
         event=registration.event,
         submit_url=url_for("events.confirmation", token=token),
+        cancel_url=url_for("events.cancel", token=token),
         registration=registration,
+        waitlist_position=position,
     )
+
+
+@events.route("/registration/<token>/cancel/", methods=["POST"])
+def cancel(token):
+    registration = load_registration(token)
+    event = registration.event
+
+    # freeing the seat and promoting from the waiting list has to be atomic
+    lock_event(event.id)
+    db.session.refresh(registration)
+    db.session.refresh(event)
+
+    if registration.status_name == "canceled":
+        flash("Deine Anmeldung ist bereits storniert", "warning")
+        return redirect(url_for("events.confirmation", token=token))
+
+    log.info(f"Cancellation for {event} by {registration.person} ({registration})")
+    was_confirmed = registration.status_name == "confirmed"
+    registration.status_name = "canceled"
+
+    promoted = promote_waiting(event) if was_confirmed else []
+    # the promotion is committed together with the queued mails
+    for promoted_registration in promoted:
+        send_confirmed_mail(promoted_registration)
+    db.session.commit()
+
+    flash("Deine Anmeldung wurde storniert", "success")
+    return redirect(url_for("events.confirmation", token=token))
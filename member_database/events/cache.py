@@ -0,0 +1,86 @@
+"""
+Caches of event data, invalidated on every change of an event or of the
+status of a registration using the cache version ``events``.
+"""
+
+from copy import deepcopy
+
+from sqlalchemy import event as sa_event
+from sqlalchemy.orm import Session, attributes, make_transient_to_detached
+
+from ..cache import VersionedCache, invalidate
+from ..models import db
+from .models import Event, EventRegistration
+
+VERSION = "events"
+
+# rendered index page for anonymous users, by locale, the ttl limits
+# stale pages if incrementing the version failed
+index_cache = VersionedCache(VERSION, maxsize=16, ttl=300)
+
+# column values of events by id and event ids by shortlink
+event_cache = VersionedCache(VERSION, maxsize=1024, ttl=300)
+
+
+def event_values(event_id):
+    """The column values of event `event_id` as dict, None if it does not exist"""
+
+    def load():
+        row = db.session.execute(
+            db.select(Event.__table__).filter_by(id=event_id)
+        ).first()
+        return None if row is None else dict(row._mapping)
+
+    return event_cache.get_or_set(("event", event_id), load)
+
+
+def event_id_for_shortlink(shortlink):
+    return event_cache.get_or_set(
+        ("shortlink", shortlink),
+        lambda: db.session.scalar(db.select(Event.id).filter_by(shortlink=shortlink)),
+    )
+
+
+def cached_event(event_id):
+    """
+    Event `event_id` attached to the session or None, without a query
+    if it is cached. Use `db.session.refresh` before relying on the
+    registration counters, e.g. when reserving a seat.
+    """
+    event = db.session.identity_map.get(db.session.identity_key(Event, event_id))
+    if event is not None:
+        return event
+
+    values = event_values(event_id)
+    if values is None:
+        return None
+
+    # every session gets its own copy, the cached values are never modified
+    event = Event()
+    for key, value in values.items():
+        attributes.set_committed_value(event, key, deepcopy(value))
+    make_transient_to_detached(event)
+    return db.session.merge(event, load=False)
+
+
+def changes_events(session):
+    for obj in session.new | session.deleted:
+        if isinstance(obj, (Event, EventRegistration)):
+            return True
+
+    for obj in session.dirty:
+        if isinstance(obj, Event) and session.is_modified(obj):
+            return True
+        if isinstance(obj, EventRegistration) and (
+            attributes.get_history(obj, "status_name").has_changes()
+            or attributes.get_history(obj, "event_id").has_changes()
+        ):
+            return True
+
+    return False
+
+
+@sa_event.listens_for(Session, "after_flush")
+def invalidate_events(session, flush_context):
+    if changes_events(session):
+        invalidate(session, VERSION)
@@ -0,0 +1,153 @@
+"""
+Denormalized number of registrations per event and status.
+
+The ``n_<status>`` columns of `Event` are updated in the same transaction
+as the registrations. Changes made through the ORM are tracked
+automatically, bulk statements bypassing the ORM have to call `recount`.
+``flask events recount`` verifies and repairs all counters.
+"""
+
+from collections import Counter
+
+from sqlalchemy import event as sa_event
+from sqlalchemy.orm import Session, attributes
+
+from ..models import db
+from .models import Event, EventRegistration, RegistrationStatus
+
+
+def counter_column(status_name):
+    return Event.__table__.c[f"n_{status_name}"]
+
+
+# load the previous value when these are changed, so it is part of the history
+for attribute in (EventRegistration.event_id, EventRegistration.status_name):
+    sa_event.listen(attribute, "set", lambda *args: None, active_history=True)
+
+
+@sa_event.listens_for(Session, "before_flush")
+def collect_deleted(session, flush_context, instances):
+    # the values of deleted registrations might not be loaded after the flush
+    deltas = session.info.setdefault("registration_deltas", Counter())
+    for obj in session.deleted:
+        if isinstance(obj, EventRegistration):
+            deltas[obj.event_id, obj.status_name] -= 1
+
+
+@sa_event.listens_for(Session, "after_soft_rollback")
+def discard_deleted(session, previous_transaction):
+    session.info.pop("registration_deltas", None)
+
+
+def registration_deltas(session):
+    """Changes of the counters caused by the registrations of this flush"""
+    deltas = session.info.pop("registration_deltas", Counter())
+
+    for obj in session.new:
+        if isinstance(obj, EventRegistration):
+            deltas[obj.event_id, obj.status_name] += 1
+
+    for obj in session.dirty:
+        if not isinstance(obj, EventRegistration):
+            continue
+        event_id = attributes.get_history(obj, "event_id")
+        status = attributes.get_history(obj, "status_name")
+        if not (event_id.has_changes() or status.has_changes()):
+            continue
+
+        old_event_id = (event_id.deleted or event_id.unchanged)[0]
+        old_status = (status.deleted or status.unchanged)[0]
+        deltas[old_event_id, old_status] -= 1
+        deltas[obj.event_id, obj.status_name] += 1
+
+    return deltas
+
+
+@sa_event.listens_for(Session, "after_flush")
+def update_counters(session, flush_context):
+    deltas = registration_deltas(session)
+    if not any(deltas.values()):
+        return
+
+    connection = session.connection()
+    by_event = {}
+    for (event_id, status_name), delta in deltas.items():
+        if delta != 0:
+            by_event.setdefault(event_id, {})[status_name] = delta
+
+    for event_id, changes in by_event.items():
+        # relative updates, so concurrent transactions do not lose updates
+        connection.execute(
+            Event.__table__.update()
+            .where(Event.__table__.c.id == event_id)
+            .values(
+                {
+                    counter_column(status): counter_column(status) + delta
+                    for status, delta in changes.items()
+                }
+            )
+        )
+
+        loaded = session.identity_map.get(session.identity_key(Event, event_id))
+        if loaded is not None:
+            session.expire(loaded, [f"n_{status}" for status in changes])
+
+
+def lock_event(event_id):
+    """
+    Serialize all transactions changing the registrations of an event,
+    the lock is held until the end of the current transaction.
+
+    PostgreSQL locks the event row, SQLite has no row locks, so the
+    database write lock is taken using an update that changes nothing.
+    """
+    if db.session.get_bind().dialect.name == "sqlite":
+        statement = (
+            db.update(Event)
+            .where(Event.id == event_id)
+            .values(id=Event.id)
+            .execution_options(synchronize_session=False)
+        )
+    else:
+        statement = db.select(Event.id).where(Event.id == event_id).with_for_update()
+    db.session.execute(statement)
+
+
+def count_registrations(event_ids=None):
+    """Count the registrations in the database, {(event_id, status_name): count}"""
+    query = db.select(
+        EventRegistration.event_id, EventRegistration.status_name, db.func.count()
+    ).group_by(EventRegistration.event_id, EventRegistration.status_name)
+    if event_ids is not None:
+        query = query.where(EventRegistration.event_id.in_(event_ids))
+    return {
+        (event_id, status): count
+        for event_id, status, count in db.session.execute(query)
+    }
+
+
+def recount(event_ids=None, dry_run=False):
+    """
+    Compare the counters with the actual number of registrations and
+    repair them, returns the ids of the events that were wrong.
+    Does not commit.
+    """
+    counts = count_registrations(event_ids)
+    query = db.select(Event).execution_options(populate_existing=True)
+    if event_ids is not None:
+        query = query.where(Event.id.in_(event_ids))
+
+    wrong = []
+    for event in db.session.scalars(query):
+        values = {
+            f"n_{status}": counts.get((event.id, status), 0)
+            for status in RegistrationStatus.STATES
+        }
+        if any(getattr(event, key) != value for key, value in values.items()):
+            wrong.append(event.id)
+            if not dry_run:
+                for key, value in values.items():
+                    setattr(event, key, value)
+
+    db.session.flush()
+    return wrong
@@ -0,0 +1,134 @@
+"""
+Streamed exports and listings of the participants of an event.
+
+Rows are fetched in batches of `BATCH_SIZE` (server side cursors where
+supported) and written to the response as they arrive, so memory use does
+not depend on the number of participants.
+"""
+
+import csv
+import io
+import json
+
+from flask import current_app
+
+from ..models import Person, db
+from .models import EventRegistration
+from .pagination import ORDER
+
+BATCH_SIZE = 500
+# characters collected before they are sent
+CHUNK_SIZE = 16 * 1024
+CSV_COLUMNS = ["id", "name", "email", "status_name", "timestamp"]
+# spreadsheets evaluate cells starting with these as formulas
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+
+def chunked(strings, size=CHUNK_SIZE):
+    """Join the small pieces of a streamed template into chunks of `size`"""
+    buffer = []
+    length = 0
+    for string in strings:
+        buffer.append(string)
+        length += len(string)
+        if length >= size:
+            yield "".join(buffer)
+            buffer = []
+            length = 0
+    if buffer:
+        yield "".join(buffer)
+
+
+def schema_fields(schema, prefix=""):
+    """
+    Yield the name and schema of the fields of `schema`,
+    fields of sub-forms as ``form.field``
+    """
+    for name, field_schema in schema.get("properties", {}).items():
+        if field_schema.get("type") == "object":
+            yield from schema_fields(field_schema, prefix=f"{prefix}{name}.")
+        else:
+            yield prefix + name, field_schema
+
+
+def schema_columns(schema):
+    return [name for name, _ in schema_fields(schema)]
+
+
+def get_dotted(data, column):
+    for key in column.split("."):
+        if not isinstance(data, dict):
+            return None
+        data = data.get(key)
+    return data
+
+
+def iter_participants(event_id):
+    """
+    Yield the registrations of an event as dicts like `as_dict` plus
+    the email of the person, without loading the ORM objects.
+    """
+    columns = EventRegistration.__table__.columns
+    query = (
+        db.select(*columns, Person.email, Person.name)
+        .join(Person, Person.id == EventRegistration.person_id)
+        .filter(EventRegistration.event_id == event_id)
+        .order_by(*ORDER)
+        .execution_options(yield_per=BATCH_SIZE)
+    )
+    for *values, email, name in db.session.execute(query):
+        registration = dict(zip(columns.keys(), values))
+        registration["person_email"] = email
+        registration["person_name"] = name
+        yield registration
+
+
+def generate_ndjson(registrations):
+    """One json object per line, like the participants in the json response"""
+    for registration in registrations:
+        registration["data"] = dict(registration["data"] or {})
+        # fill email from person if not present in data
+        registration["data"].setdefault("email", registration.pop("person_email"))
+        registration.pop("person_name")
+        yield current_app.json.dumps(registration) + "\n"
+
+
+def format_csv_value(value):
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def generate_csv(schema, registrations):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # name and email of the schema are already part of the fixed columns
+    data_columns = [c for c in schema_columns(schema) if c not in CSV_COLUMNS]
+
+    def flush():
+        value = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return value
+
+    writer.writerow(CSV_COLUMNS + data_columns)
+    yield flush()
+
+    for registration in registrations:
+        data = registration["data"] or {}
+        timestamp = registration["timestamp"]
+        row = [
+            registration["id"],
+            data.get("name", registration["person_name"]),
+            data.get("email", registration["person_email"]),
+            registration["status_name"],
+            timestamp.isoformat() if timestamp is not None else None,
+        ]
+        row.extend(get_dotted(data, c) for c in data_columns)
+        writer.writerow([format_csv_value(value) for value in row])
+        if buffer.tell() >= CHUNK_SIZE:
+            yield flush()
+
+    yield flush()
@@ -1,9 +1,17 @@
 from flask_wtf import FlaskForm
-from wtforms import MultipleFileField, StringField, SubmitField, TextAreaField
+from flask_wtf.file import FileField, FileRequired
+from wtforms import (
+    BooleanField,
+    MultipleFileField,
+    SelectField,
+    StringField,
+    SubmitField,
+    TextAreaField,
+)
 from wtforms.fields import EmailField
 from wtforms.validators import DataRequired
 
-# from flask_wtf.file import FileField, FileRequired
+from .models import RegistrationStatus
 
 
 class SendMailForm(FlaskForm):
@@ -15,3 +23,22 @@ class SendMailForm(FlaskForm):
 
     attachments = MultipleFileField("Anhänge")
     submit = SubmitField("Email senden")
+
+
+class ResendForm(FlaskForm):
+    email = EmailField(validators=[DataRequired()])
+    submit = SubmitField("Emails für aktuelle Anmeldungen erneut versenden.")
+
+
+class ImportForm(FlaskForm):
+    file = FileField("CSV-Datei", validators=[FileRequired()])
+    status = SelectField(
+        "Status",
+        choices=[
+            (RegistrationStatus.CONFIRMED, "Bestätigt"),
+            (RegistrationStatus.PENDING, "Unbestätigt"),
+            (RegistrationStatus.WAITING, "Warteliste"),
+        ],
+    )
+    send_mail = BooleanField("Bestätigungsmails verschicken")
+    submit = SubmitField("Importieren")
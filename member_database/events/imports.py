@@ -0,0 +1,193 @@
+"""
+Import of registrations from csv files, e.g. participant lists of the faculty.
+
+The file needs the columns ``name`` and ``email`` and may contain the
+fields of the registration schema, fields of sub-forms as ``form.field``
+like in the csv export. Persons are matched by email ignoring case, persons and
+registrations are inserted in batches of `BATCH_SIZE`.
+"""
+
+import csv
+from datetime import datetime, timezone
+
+from jsonschema import ValidationError
+
+from ..cache import invalidate
+from ..models import Person, db
+from .cache import VERSION
+from .counters import lock_event, recount
+from .export import schema_fields
+from .json_forms import validate
+from .models import EventRegistration
+
+BATCH_SIZE = 500
+REQUIRED_COLUMNS = ("name", "email")
+TRUE = {"1", "true", "yes", "ja", "x"}
+FALSE = {"0", "false", "no", "nein"}
+
+
+def batches(items, size=BATCH_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
+
+
+def convert(value, schema):
+    """Convert a csv cell to the type of the field"""
+    if schema.get("type") == "integer":
+        return int(value)
+    if schema.get("type") == "number":
+        return float(value)
+    if schema.get("type") == "boolean":
+        if value.lower() in TRUE:
+            return True
+        if value.lower() in FALSE:
+            return False
+        raise ValueError(f"{value!r} is not a boolean")
+    return value
+
+
+def read_registrations(lines, schema):
+    """
+    Parse and validate the registrations of a csv file.
+
+    Returns a list of (email, name, data) and a list of error messages,
+    nothing should be imported if there are errors.
+    """
+    reader = csv.DictReader(lines)
+    fields = dict(schema_fields(schema))
+    columns = reader.fieldnames or []
+
+    errors = [f"Missing column {c!r}" for c in REQUIRED_COLUMNS if c not in columns]
+    errors.extend(
+        f"Unknown column {c!r}"
+        for c in columns
+        if c not in fields and c not in REQUIRED_COLUMNS
+    )
+    if errors:
+        return [], errors
+
+    rows = []
+    seen = set()
+    for row in reader:
+        line = reader.line_num
+        name = (row["name"] or "").strip()
+        email = (row["email"] or "").strip()
+        if not name or "@" not in email:
+            errors.append(f"Line {line}: name and a valid email are required")
+            continue
+        if email.lower() in seen:
+            errors.append(f"Line {line}: {email} is listed more than once")
+            continue
+        seen.add(email.lower())
+
+        data = {"name": name}
+        try:
+            for column, field_schema in fields.items():
+                value = (row.get(column) or "").strip()
+                # empty cells are missing values
+                if value == "":
+                    continue
+                *parents, key = column.split(".")
+                target = data
+                for parent in parents:
+                    target = target.setdefault(parent, {})
+                target[key] = convert(value, field_schema)
+            validate(data, schema)
+        except (ValueError, ValidationError) as e:
+            errors.append(f"Line {line}: {getattr(e, 'message', e)}")
+            continue
+
+        rows.append((email, name, data))
+
+    return rows, errors
+
+
+def person_ids(emails):
+    """Ids of the persons with `emails` by lower case email"""
+    email = db.func.lower(Person.email)
+    ids = {}
+    for batch in batches([e.lower() for e in emails]):
+        ids.update(
+            db.session.execute(
+                db.select(email, Person.id).where(email.in_(batch))
+            ).all()
+        )
+    return ids
+
+
+def import_registrations(event, rows, status_name="confirmed"):
+    """
+    Insert registrations to `event` for the rows returned by
+    `read_registrations`, creating the persons that do not exist yet.
+    Persons that are already registered are skipped. Confirmed
+    registrations exceeding `Event.max_participants` are put on
+    the waiting list, in the order of the rows.
+
+    Returns the ids of the new registrations and the number of them
+    put on the waiting list. Does not commit.
+    """
+    # keep confirmations from taking seats while the free places are
+    # counted and the counters are repaired
+    lock_event(event.id)
+    db.session.refresh(event)
+
+    emails = [email for email, _, _ in rows]
+    ids = person_ids(emails)
+    new_persons = [
+        {"name": name, "email": email}
+        for email, name, _ in rows
+        if email.lower() not in ids
+    ]
+    for batch in batches(new_persons):
+        db.session.execute(db.insert(Person), batch)
+    ids.update(person_ids([p["email"] for p in new_persons]))
+
+    registered = set()
+    for batch in batches(list(ids.values())):
+        registered.update(
+            db.session.scalars(
+                db.select(EventRegistration.person_id).where(
+                    EventRegistration.event_id == event.id,
+                    EventRegistration.person_id.in_(batch),
+                )
+            )
+        )
+
+    timestamp = None if status_name == "pending" else datetime.now(timezone.utc)
+    registrations = [
+        {
+            "event_id": event.id,
+            "person_id": ids[email.lower()],
+            "status_name": status_name,
+            "data": data,
+            "timestamp": timestamp,
+        }
+        for email, _, data in rows
+        if ids[email.lower()] not in registered
+    ]
+
+    n_waiting = 0
+    if status_name == "confirmed" and event.max_participants:
+        free_places = max(event.max_participants - event.n_confirmed, 0)
+        for registration in registrations[free_places:]:
+            registration["status_name"] = "waitinglist"
+            n_waiting += 1
+
+    for batch in batches(registrations):
+        db.session.execute(db.insert(EventRegistration), batch)
+
+    # bulk inserts are not seen by the counters and caches
+    recount([event.id])
+    invalidate(db.session, VERSION)
+
+    new_ids = []
+    for batch in batches([r["person_id"] for r in registrations]):
+        new_ids.extend(
+            db.session.scalars(
+                db.select(EventRegistration.id).where(
+                    EventRegistration.event_id == event.id,
+                    EventRegistration.person_id.in_(batch),
+                )
+            )
+        )
+    return new_ids, n_waiting
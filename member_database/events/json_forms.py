@@ -1,11 +1,22 @@
+from copy import deepcopy
+
 import wtforms
 from flask_wtf import FlaskForm
+from jsonschema.exceptions import best_match
+from jsonschema.validators import Draft7Validator
 from markupsafe import Markup
 from wtforms.fields import DecimalField, EmailField, IntegerField, TextAreaField
 from wtforms.validators import DataRequired, NumberRange, Regexp
 
+from ..cache import TTLCache
+from ..utils import schema_hash
 from ..widgets import LatexInput
 
+# compiled form classes by schema hash and key, see `cached_wtf_form`
+form_cache = TTLCache(maxsize=128)
+# validators of checked schemas by schema hash, see `get_validator`
+validator_cache = TTLCache(maxsize=128)
+
 
 def create_wtf_field(name, schema, required=True):
     validators = []
@@ -103,3 +114,43 @@ def create_wtf_form(
         attrs["submit"] = wtforms.SubmitField("Anmelden")
 
     return type("JSONForm", baseclasses, attrs)
+
+
+def cached_wtf_form(schema, key=(), additional_fields=None):
+    """
+    Like `create_wtf_form`, but reuse the form class for equal schemas.
+
+    `additional_fields` is a function returning the additional fields,
+    it is only called if the form is not cached yet, `key` has to
+    identify its result.
+    """
+    cache_key = (schema_hash(schema), key)
+    form = form_cache.get(cache_key)
+    if form is None:
+        form = create_wtf_form(
+            schema,
+            additional_fields=additional_fields() if additional_fields else None,
+        )
+        form_cache.set(cache_key, form)
+    return form
+
+
+def get_validator(schema):
+    """
+    Draft7Validator for `schema`, the schema is only checked against the
+    meta schema when it is not cached yet. Raises `SchemaError`.
+    """
+    key = schema_hash(schema)
+    validator = validator_cache.get(key)
+    if validator is None:
+        Draft7Validator.check_schema(schema)
+        validator = Draft7Validator(deepcopy(schema))
+        validator_cache.set(key, validator)
+    return validator
+
+
+def validate(data, schema):
+    """Like `jsonschema.validate`, but using the cached validator of `schema`"""
+    error = best_match(get_validator(schema).iter_errors(data))
+    if error is not None:
+        raise error
@@ -0,0 +1,6 @@
+from ..metrics import Counter
+
+registrations_shed = Counter(
+    "events_registrations_shed_total",
+    "Registration submits rejected because too many were processed at once",
+)
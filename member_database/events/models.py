@@ -1,16 +1,25 @@
-from jsonschema.validators import Draft7Validator
 from sqlalchemy.ext.mutable import MutableDict
 from sqlalchemy.orm import validates
 
+from ..mail.models import utcnow
 from ..models import db
+from .json_forms import get_validator
 
 
 class Event(db.Model):
+    # how notify_email is informed about new registrations
+    IMMEDIATE = "immediate"
+    DIGEST = "digest"
+    NOTIFICATION_MODES = (IMMEDIATE, DIGEST)
+
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String)
     description = db.Column(db.Text)
     footer = db.Column(db.Text, default=None, nullable=True)
     notify_email = db.Column(db.Text)
+    notification_mode = db.Column(
+        db.String(16), nullable=False, default=IMMEDIATE, server_default=IMMEDIATE
+    )
     force_tu_mail = db.Column(db.Boolean, default=False)
 
     shortlink = db.Column(db.String, default=None, nullable=True, unique=True)
@@ -20,9 +29,21 @@ class Event(db.Model):
     registration_open = db.Column(db.Boolean, default=False)
     registration_schema = db.Column(MutableDict.as_mutable(db.JSON), nullable=False)
 
+    # number of registrations per status, maintained by `counters`
+    n_confirmed = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    n_pending = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    n_waitinglist = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    n_canceled = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+
+    # incremented on every change through the ORM, used for ETags and to
+    # detect concurrent edits, not by the counters above
+    version = db.Column(db.Integer, nullable=False, server_default="1")
+
+    __mapper_args__ = {"version_id_col": version}
+
     @validates("registration_schema")
     def validate_schema(self, key, schema):
-        Draft7Validator.check_schema(schema)
+        get_validator(schema)
         return schema
 
     def __repr__(self):
@@ -49,10 +70,21 @@ class EventRegistration(db.Model):
 
     data = db.Column(MutableDict.as_mutable(db.JSON))
     timestamp = db.Column(db.DateTime(timezone=True))
+    # last change, for clients polling with changed_since
+    updated_at = db.Column(
+        db.DateTime(timezone=True), default=utcnow, onupdate=utcnow, index=True
+    )
 
     __table_args__ = (
         # a person can only register once for an event
         db.UniqueConstraint("event_id", "person_id", name="unique_person_event"),
+        # finding the next registration on the waiting list and its position
+        db.Index(
+            "ix_event_registration_event_status_timestamp",
+            "event_id",
+            "status_name",
+            "timestamp",
+        ),
     )
 
     def __repr__(self):
@@ -0,0 +1,76 @@
+"""
+Keyset pagination of registrations in the order of the participants list,
+``(timestamp IS NULL, timestamp, id)``.
+
+The cursor is the position of the last registration of the previous page,
+so later pages do not depend on OFFSET scans and are stable under inserts.
+"""
+
+from datetime import datetime, timezone
+
+from flask import current_app
+from itsdangerous import BadData, URLSafeSerializer
+
+from ..models import db
+from .models import EventRegistration
+
+# maximum page size
+MAX_LIMIT = 1000
+
+ORDER = (
+    EventRegistration.timestamp.is_(None),
+    EventRegistration.timestamp,
+    EventRegistration.id,
+)
+
+
+def serializer():
+    return URLSafeSerializer(current_app.secret_key, salt="participants-cursor")
+
+
+def encode_cursor(registration):
+    timestamp = registration.timestamp
+    return serializer().dumps(
+        [timestamp.isoformat() if timestamp is not None else None, registration.id]
+    )
+
+
+def decode_cursor(cursor):
+    """Returns (timestamp, id), raises ValueError for invalid cursors"""
+    try:
+        timestamp, registration_id = serializer().loads(cursor)
+    except (BadData, TypeError) as e:
+        raise ValueError(f"Invalid cursor {cursor!r}") from e
+
+    if timestamp is not None:
+        timestamp = datetime.fromisoformat(timestamp)
+    return timestamp, registration_id
+
+
+def after_cursor(cursor):
+    """Condition selecting the registrations after `cursor` in `ORDER`"""
+    timestamp, registration_id = decode_cursor(cursor)
+    if timestamp is None:
+        return db.and_(
+            EventRegistration.timestamp.is_(None),
+            EventRegistration.id > registration_id,
+        )
+    return db.or_(
+        EventRegistration.timestamp.is_(None),
+        EventRegistration.timestamp > timestamp,
+        db.and_(
+            EventRegistration.timestamp == timestamp,
+            EventRegistration.id > registration_id,
+        ),
+    )
+
+
+def parse_datetime(value):
+    """Parse an ISO 8601 timestamp as UTC, raises ValueError"""
+    # fromisoformat does not know the Z suffix before python 3.11
+    if value.endswith("Z"):
+        value = value[:-1] + "+00:00"
+    value = datetime.fromisoformat(value)
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
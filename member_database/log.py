@@ -1,9 +1,200 @@
+import atexit
 import logging
-from logging.handlers import SMTPHandler, TimedRotatingFileHandler
+import queue
+import threading
+import time
+import traceback
+from collections import Counter
+from datetime import datetime
+from logging.handlers import (
+    QueueHandler,
+    QueueListener,
+    SMTPHandler,
+    TimedRotatingFileHandler,
+)
+
+from . import metrics
+
+records_dropped = metrics.Counter(
+    "log_records_dropped_total",
+    "Log records dropped because the logging queue was full",
+    ["level"],
+)
+
+
+def fingerprint(record):
+    """
+    Identify records caused by the same problem, exceptions by their type
+    and the location in the traceback, other records by where they were logged.
+    """
+    if record.exc_info and record.exc_info[1] is not None:
+        exc_type, _, tb = record.exc_info
+        location = tuple(
+            (frame.f_code.co_filename, lineno)
+            for frame, lineno in traceback.walk_tb(tb)
+        )
+        return (exc_type.__module__, exc_type.__qualname__, location)
+    return (record.name, record.pathname, record.lineno)
+
+
+class DigestHandler(logging.Handler):
+    """
+    Pass the first record of each kind (see `fingerprint`) on to `target`
+    and fold repeats within `interval` seconds into a single digest record,
+    which is emitted at the end of the interval.
+    """
+
+    def __init__(self, target, interval, clock=time.monotonic):
+        super().__init__(target.level)
+        self.target = target
+        self.interval = interval
+        self.clock = clock
+        # fingerprint -> time the last record was passed on
+        self.sent = {}
+        # fingerprint -> [count, first repeated record, last repeated record]
+        self.repeated = {}
+        self._timer = None
+        self._pruned = clock()
+
+    def emit(self, record):
+        key = getattr(record, "fingerprint", None) or fingerprint(record)
+        now = self.clock()
+
+        with self.lock:
+            if now - self._pruned >= self.interval:
+                self._prune(now)
+
+            sent = self.sent.get(key)
+            if sent is None or now - sent >= self.interval:
+                self.sent[key] = now
+                forward = True
+            else:
+                forward = False
+                if key in self.repeated:
+                    self.repeated[key][0] += 1
+                    self.repeated[key][2] = record
+                else:
+                    self.repeated[key] = [1, record, record]
+
+                if self._timer is None:
+                    self._timer = threading.Timer(self.interval, self.flush)
+                    self._timer.daemon = True
+                    self._timer.start()
+
+        if forward:
+            self.target.handle(record)
+
+    def flush(self):
+        with self.lock:
+            repeated, self.repeated = self.repeated, {}
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+            self._prune(self.clock())
+
+        if repeated:
+            self.target.handle(self.digest(repeated.values()))
+
+    def _prune(self, now):
+        """Forget the records sent more than `interval` seconds ago"""
+        self.sent = {
+            key: sent for key, sent in self.sent.items() if now - sent < self.interval
+        }
+        self._pruned = now
+
+    def digest(self, repeated):
+        total = sum(count for count, _, _ in repeated)
+        lines = [
+            f"{total} repeated log records in the last {self.interval / 60:.0f}"
+            " minutes, only the first occurrence was sent:",
+            "",
+        ]
+        for count, first, last in sorted(repeated, key=lambda r: -r[0]):
+            summary = first.getMessage().splitlines()[0]
+            lines.append(
+                f"{count:>6}x {first.levelname} {first.name}: {summary}"
+                f" ({datetime.fromtimestamp(first.created):%H:%M:%S}"
+                f" - {datetime.fromtimestamp(last.created):%H:%M:%S})"
+            )
+
+        levelno = max(first.levelno for _, first, _ in repeated)
+        return logging.makeLogRecord(
+            dict(
+                name=__name__,
+                levelno=levelno,
+                levelname=logging.getLevelName(levelno),
+                msg="\n".join(lines),
+            )
+        )
+
+    def close(self):
+        self.flush()
+        self.target.close()
+        super().close()
+
+
+class DroppingQueueHandler(QueueHandler):
+    """
+    QueueHandler that never blocks the logging thread.
+
+    If the bounded queue is full, the record is dropped and counted
+    per level in `dropped` and the ``log_records_dropped_total`` metric.
+    """
+
+    def __init__(self, maxsize):
+        super().__init__(queue.Queue(maxsize))
+        self.dropped = Counter()
+        self._dropped_lock = threading.Lock()
+
+    def prepare(self, record):
+        # the traceback is formatted into the message and removed here,
+        # keep what is needed to group the records behind the queue
+        record.fingerprint = fingerprint(record)
+        return super().prepare(record)
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._dropped_lock:
+                self.dropped[record.levelname] += 1
+            records_dropped.inc(level=record.levelname)
+
+
+class BackgroundListener(QueueListener):
+    """QueueListener that can be stopped even if its queue is full"""
+
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)
+
+    def stop(self):
+        if self._thread is not None:
+            super().stop()
+
+
+def queued(handler, maxsize):
+    """
+    Wrap `handler` so that records are only put into a queue and
+    `handler` is called from a background thread.
+    Returns the queue handler, its listener is stopped at exit.
+    """
+    queue_handler = DroppingQueueHandler(maxsize)
+    queue_handler.setLevel(handler.level)
+    queue_handler.listener = BackgroundListener(
+        queue_handler.queue, handler, respect_handler_level=True
+    )
+    queue_handler.listener.start()
+    atexit.register(queue_handler.listener.stop)
+    return queue_handler
 
 
 def setup_logging(app):
-    if not app.debug and app.config["MAIL_SERVER"]:
+    maxsize = app.config["LOG_QUEUE_SIZE"]
+
+    # like flask-mail, tests do not send mails unless asked to
+    suppress = app.config.get("MAIL_SUPPRESS_SEND", app.testing)
+    if not app.debug and not suppress and app.config["MAIL_SERVER"]:
         if app.config["MAIL_USE_SSL"]:
             app.logger.warning("SSL not supported by logging.SMTPHandler")
             return
@@ -28,7 +219,13 @@ def setup_logging(app):
             secure=secure,
         )
         mail_handler.setLevel(logging.ERROR)
-        app.logger.addHandler(mail_handler)
+        mail_handler = DigestHandler(
+            mail_handler, app.config["ERROR_MAIL_DIGEST_INTERVAL"]
+        )
+
+        # sending the mail must not block the failing request
+        handler = queued(mail_handler, maxsize)
+        app.logger.addHandler(handler)
 
     if app.config.get("LOG_FILE"):
         handler = TimedRotatingFileHandler(app.config["LOG_FILE"], when="midnight")
@@ -37,4 +234,6 @@ def setup_logging(app):
             datefmt="%Y-%m-%dT%H:%M:%s",
         )
         handler.setFormatter(formatter)
+
+        handler = queued(handler, maxsize)
         logging.getLogger().addHandler(handler)
@@ -0,0 +1,257 @@
+import logging
+import socket
+
+from flask import current_app, render_template
+from flask_mail import BadHeaderError, Mail, Message, sanitize_address
+
+from ..cache import TTLCache
+from ..models import Person, db
+from . import metrics
+from .models import MassMail, Notification, OutboxMessage
+from .spool import load_attachments, remove_spool_dir, spool_message
+
+__all__ = [
+    "mail",
+    "send_email",
+    "send_mass_email",
+    "send_notification",
+    "enqueue",
+    "enqueue_mass_mail",
+    "MassMail",
+    "Notification",
+    "OutboxMessage",
+]
+
+log = logging.getLogger(__name__)
+
+socket.setdefaulttimeout(30)
+mail = Mail()
+
+
+class EnvelopeMessage(Message):
+    """Message whose envelope recipients `send_to` can differ from its headers"""
+
+    def __init__(self, *args, send_to=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._send_to = send_to
+
+    @property
+    def send_to(self):
+        if self._send_to is None:
+            return super().send_to
+        return set(self._send_to)
+
+
+def enqueue(msg, dedupe_key=None):
+    """
+    Store a message in the outbox, the mail worker (``flask mail worker``)
+    takes care of actually delivering it.
+
+    The message is added to the current database session, the caller
+    commits it together with the changes that caused it.
+    """
+    if msg.has_bad_headers():
+        raise BadHeaderError
+
+    outbox_message = OutboxMessage(
+        subject=msg.subject,
+        sender=sanitize_address(msg.sender),
+        recipients=sorted(sanitize_address(r) for r in msg.send_to),
+        message=msg.as_bytes(),
+        dedupe_key=dedupe_key,
+    )
+    db.session.add(outbox_message)
+    db.session.flush()
+    metrics.enqueued.inc(kind="single")
+    log.info(f'Queued mail with subject "{msg.subject}" to {msg.recipients}')
+    return outbox_message
+
+
+def enqueue_mass_mail(msg, chunks, spooled_attachments=()):
+    """
+    Store a message for many recipients in the outbox.
+
+    The message is encoded once, every chunk of bcc recipients becomes
+    its own outbox entry, so failed chunks are retried independently.
+    The visible recipients only get the mail with the first chunk.
+    Messages with `spooled_attachments` are encoded into the spool directory.
+    Like `enqueue`, this does not commit.
+    """
+    if msg.has_bad_headers():
+        raise BadHeaderError
+
+    sender = sanitize_address(msg.sender)
+    visible = sorted(sanitize_address(r) for r in set(msg.recipients + msg.cc))
+    if spooled_attachments:
+        mass_mail = MassMail(
+            subject=msg.subject, path=spool_message(msg, spooled_attachments)
+        )
+    else:
+        mass_mail = MassMail(subject=msg.subject, message=msg.as_bytes())
+
+    for i, chunk in enumerate(chunks):
+        recipients = visible if i == 0 else []
+        recipients = recipients + [sanitize_address(r) for r in chunk]
+        mass_mail.chunks.append(
+            OutboxMessage(subject=msg.subject, sender=sender, recipients=recipients)
+        )
+
+    db.session.add(mass_mail)
+    db.session.flush()
+    metrics.enqueued.inc(len(chunks), kind="mass_chunk")
+    log.info(f'Queued mass mail "{msg.subject}" in {len(chunks)} chunks')
+    return mass_mail
+
+
+def is_duplicate(dedupe_key):
+    """
+    Check if a mail with the same `dedupe_key` was sent by this process
+    within the last ``MAIL_DEDUPE_WINDOW`` seconds or is still waiting
+    in the outbox. Marks the key as seen.
+    """
+    window = current_app.config["MAIL_DEDUPE_WINDOW"]
+    if not window:
+        return False
+
+    seen = current_app.extensions.get("mail_dedupe")
+    if seen is None or seen.ttl != window:
+        seen = current_app.extensions["mail_dedupe"] = TTLCache(100_000, ttl=window)
+
+    if not seen.add(dedupe_key):
+        return True
+
+    # the outbox is shared by all processes
+    pending = db.session.scalar(
+        db.select(OutboxMessage.id)
+        .filter_by(dedupe_key=dedupe_key)
+        .where(OutboxMessage.status.in_([OutboxMessage.PENDING, OutboxMessage.SENDING]))
+        .limit(1)
+    )
+    return pending is not None
+
+
+def remove_invalid(addresses):
+    """Remove the addresses of persons whose mails bounced"""
+    invalid = set(
+        db.session.scalars(
+            db.select(Person.email).where(
+                Person.email.in_(addresses), Person.email_valid.is_(False)
+            )
+        )
+    )
+    if invalid:
+        metrics.skipped_invalid.inc(len(invalid))
+        log.info(f"Not sending mail to bounced addresses {sorted(invalid)}")
+    return [address for address in addresses if address not in invalid]
+
+
+def send_email(subject, sender, recipients, body, dedupe_key=None, **kwargs):
+    """
+    Send an email by putting it into the outbox, the caller has to commit
+
+    Mails with the same `dedupe_key` are coalesced, see `is_duplicate`,
+    recipients whose mails bounced are skipped.
+    Returns False if the mail was not sent for one of these reasons.
+    """
+    recipients = remove_invalid(recipients)
+    if not recipients:
+        return False
+
+    if dedupe_key is not None and is_duplicate(dedupe_key):
+        metrics.coalesced.inc()
+        log.info(f'Coalesced mail with subject "{subject}" to {recipients}')
+        return False
+
+    msg = Message(subject=subject, sender=sender, recipients=recipients, **kwargs)
+    msg.body = body
+
+    try:
+        # the outbox is processed by another process, so record_messages
+        # would never see these mails, just send it here for the unit tests
+        if current_app.config["TESTING"]:
+            mail.send(msg)
+        elif current_app.config["DEBUG"] is True:
+            print(body)
+        else:
+            enqueue(msg, dedupe_key=dedupe_key)
+    except Exception:
+        # allow sending it again
+        seen = current_app.extensions.get("mail_dedupe")
+        if dedupe_key is not None and seen is not None:
+            seen.pop(dedupe_key)
+        raise
+
+    return True
+
+
+def send_notification(recipient, subject, template, digest_subject, digest, **context):
+    """
+    Notify `recipient` (e.g. the organizers of an event) using `template`.
+
+    If `digest` is True, the notification is only stored and later sent
+    together with all other notifications for the same recipient and
+    `digest_subject`, see `digest.flush_digests`.
+    The template is rendered with ``digest`` set accordingly.
+    Does not commit, like `send_email`.
+    """
+    body = render_template(template, digest=digest, **context)
+    if not digest:
+        return send_email(
+            subject=subject,
+            sender=current_app.config["MAIL_SENDER"],
+            recipients=[recipient],
+            body=body,
+        )
+
+    db.session.add(Notification(recipient=recipient, subject=digest_subject, body=body))
+    log.info(f'Stored notification "{subject}" for the digest to {recipient}')
+    return True
+
+
+def send_mass_email(
+    subject, sender, recipients, bcc, body, spooled_attachments=(), **kwargs
+):
+    """
+    Send an email to many bcc recipients, split into chunks
+    of at most ``MAIL_BCC_CHUNK_SIZE`` recipients.
+
+    `spooled_attachments` are attachments already written to disk
+    using `spool.spool_uploads`, the spool is removed after sending.
+    The caller has to commit.
+    """
+    chunk_size = current_app.config["MAIL_BCC_CHUNK_SIZE"]
+    chunks = [bcc[i : i + chunk_size] for i in range(0, len(bcc), chunk_size)]
+    if len(chunks) == 0:
+        chunks = [[]]
+
+    def make_message(bcc=None, send_to=None):
+        msg = EnvelopeMessage(
+            subject=subject,
+            sender=sender,
+            recipients=recipients,
+            bcc=bcc,
+            send_to=send_to,
+            **kwargs,
+        )
+        msg.body = body
+        return msg
+
+    if current_app.config["TESTING"]:
+        kwargs["attachments"] = load_attachments(spooled_attachments)
+        with mail.connect() as connection:
+            # the visible recipients only get the first chunk, see enqueue_mass_mail
+            for i, chunk in enumerate(chunks):
+                connection.send(make_message(bcc=chunk, send_to=chunk if i else None))
+    elif current_app.config["DEBUG"] is True:
+        load_attachments(spooled_attachments)
+        print(f"Mail to {len(bcc)} recipients in {len(chunks)} chunks")
+        print(body)
+    else:
+        try:
+            enqueue_mass_mail(make_message(), chunks, spooled_attachments)
+        except Exception:
+            if spooled_attachments:
+                remove_spool_dir(spooled_attachments[0].path)
+            raise
+
+    return len(chunks)
@@ -0,0 +1,100 @@
+"""
+Delivery backends of the mail worker, selected with ``MAIL_BACKEND``.
+
+``smtp`` sends to ``MAIL_SERVER``, ``maildir`` stores every message in the
+Maildir ``MAIL_MAILDIR`` and ``console`` prints it. The latter two allow to
+run the complete mail path locally without a relay.
+Other backends can be given as import path, e.g. ``mypackage.mail:Backend``.
+
+A backend is created once per app with the app as only argument and has to
+implement ``send_batch(envelopes, throttle=None)`` like `smtp.send_batch`.
+"""
+
+import abc
+import mailbox
+import sys
+import threading
+
+from werkzeug.utils import import_string
+
+from .smtp import send_batch
+
+
+def read_message(message):
+    """`message` of an envelope is either the encoded message or a spool path"""
+    if isinstance(message, bytes):
+        return message
+    with open(message, "rb") as f:
+        return f.read()
+
+
+def with_envelope_headers(sender, recipients, message):
+    """Prepend the envelope, bcc recipients are not part of the message"""
+    headers = [f"X-Envelope-From: {sender}"]
+    headers.extend(f"X-Envelope-To: {recipient}" for recipient in recipients)
+    return "\r\n".join(headers).encode("utf-8") + b"\r\n" + read_message(message)
+
+
+class LocalBackend(abc.ABC):
+    """Base for backends that cannot fail partially"""
+
+    def __init__(self, app):
+        self.app = app
+        self._lock = threading.Lock()
+
+    @abc.abstractmethod
+    def deliver(self, sender, recipients, message):
+        """Deliver a single message, called with the backend locked"""
+
+    def send_batch(self, envelopes, throttle=None):
+        errors = []
+        for envelope in envelopes:
+            if throttle is not None:
+                throttle()
+            try:
+                with self._lock:
+                    self.deliver(*envelope)
+            except Exception as e:
+                errors.append(e)
+            else:
+                errors.append(None)
+        return errors
+
+
+class SMTPBackend:
+    def __init__(self, app):
+        self.app = app
+
+    def send_batch(self, envelopes, throttle=None):
+        return send_batch(envelopes, throttle=throttle)
+
+
+class MaildirBackend(LocalBackend):
+    def __init__(self, app):
+        super().__init__(app)
+        self.maildir = mailbox.Maildir(app.config["MAIL_MAILDIR"], create=True)
+
+    def deliver(self, sender, recipients, message):
+        self.maildir.add(with_envelope_headers(sender, recipients, message))
+
+
+class ConsoleBackend(LocalBackend):
+    def deliver(self, sender, recipients, message):
+        message = with_envelope_headers(sender, recipients, message)
+        print(message.decode("utf-8", "replace"), file=sys.stdout, flush=True)
+
+
+BACKENDS = {
+    "smtp": SMTPBackend,
+    "maildir": MaildirBackend,
+    "console": ConsoleBackend,
+}
+
+
+def get_backend(app):
+    backend = app.extensions.get("mail_backend")
+    if backend is None:
+        name = app.config["MAIL_BACKEND"]
+        cls = BACKENDS[name] if name in BACKENDS else import_string(name)
+        backend = app.extensions.setdefault("mail_backend", cls(app))
+    return backend
@@ -0,0 +1,83 @@
+"""
+Parsing of bounce messages (delivery status notifications, RFC 3464).
+
+Only permanent failures (status 5.x.x) are considered, temporary
+failures are retried by the sending relay anyway.
+"""
+
+import logging
+import mailbox
+import os
+
+from ..models import Person, db
+
+log = logging.getLogger(__name__)
+
+
+def parse_bounce(message):
+    """Return the permanently failed recipients of a DSN `message`"""
+    if message.get_content_type() != "multipart/report":
+        return []
+    if message.get_param("report-type", "").lower() != "delivery-status":
+        return []
+
+    addresses = []
+    for part in message.walk():
+        if part.get_content_type() != "message/delivery-status":
+            continue
+
+        # the first block contains the per message fields,
+        # every following block one recipient
+        for fields in part.get_payload()[1:]:
+            action = fields.get("Action", "").strip().lower()
+            status = fields.get("Status", "").strip()
+            recipient = fields.get("Final-Recipient") or fields.get(
+                "Original-Recipient", ""
+            )
+            # e.g. "rfc822; user@example.org"
+            address = recipient.rpartition(";")[2].strip().strip("<>")
+            if action == "failed" and status.startswith("5") and address:
+                addresses.append(address.lower())
+
+    return addresses
+
+
+def open_mailbox(path):
+    if os.path.isdir(path):
+        return mailbox.Maildir(path, factory=None, create=False)
+    return mailbox.mbox(path, create=False)
+
+
+def collect_bounces(box):
+    """
+    Return the set of bounced addresses and the keys of the bounce
+    messages in mailbox `box`
+    """
+    addresses = set()
+    keys = []
+    for key, message in box.iteritems():
+        bounced = parse_bounce(message)
+        if bounced:
+            addresses.update(bounced)
+            keys.append(key)
+    return addresses, keys
+
+
+def mark_invalid(addresses, chunk_size=500):
+    """Set ``email_valid`` of all persons with one of `addresses` to False"""
+    addresses = sorted(addresses)
+    n_updated = 0
+    for start in range(0, len(addresses), chunk_size):
+        result = db.session.execute(
+            db.update(Person)
+            .where(
+                db.func.lower(Person.email).in_(addresses[start : start + chunk_size]),
+                Person.email_valid.is_not(False),
+            )
+            .values(email_valid=False)
+            .execution_options(synchronize_session=False)
+        )
+        n_updated += result.rowcount
+    db.session.commit()
+    log.info(f"Marked {n_updated} addresses as invalid")
+    return n_updated
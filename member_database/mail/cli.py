@@ -0,0 +1,112 @@
+from datetime import timedelta
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+
+from .. import metrics
+from ..models import db
+from .bounces import collect_bounces, mark_invalid, open_mailbox
+from .models import MassMail, OutboxMessage, utcnow
+from .worker import run_worker
+
+mail_cli = AppGroup("mail", help="Manage the outbox of outgoing mails.")
+
+
+@mail_cli.command("worker")
+@click.option("--batch-size", type=int, help="Messages claimed at once.")
+@click.option("--concurrency", type=int, help="Maximum parallel SMTP connections.")
+@click.option("--poll-interval", type=float, help="Seconds to wait when idle.")
+@click.option("--once", is_flag=True, help="Exit once no message is due.")
+@click.option("--metrics-port", type=int, help="Serve metrics on this local port.")
+def worker_command(batch_size, concurrency, poll_interval, once, metrics_port):
+    """Deliver the mails stored in the outbox."""
+    if metrics_port:
+        metrics.serve(current_app._get_current_object(), metrics_port)
+    run_worker(
+        batch_size=batch_size,
+        concurrency=concurrency,
+        poll_interval=poll_interval,
+        once=once,
+    )
+
+
+@mail_cli.command("purge")
+@click.option("--days", type=int, default=30, show_default=True)
+def purge_command(days):
+    """Delete sent mails older than the given number of days."""
+    result = db.session.execute(
+        db.delete(OutboxMessage).where(
+            OutboxMessage.status == OutboxMessage.SENT,
+            OutboxMessage.sent_at < utcnow() - timedelta(days=days),
+        )
+    )
+    # mass mails without any remaining chunk
+    db.session.execute(
+        db.delete(MassMail).where(
+            ~db.select(OutboxMessage.id)
+            .where(OutboxMessage.mass_mail_id == MassMail.id)
+            .exists()
+        )
+    )
+    db.session.commit()
+    click.echo(f"Deleted {result.rowcount} sent mails")
+
+
+@mail_cli.command("status")
+def status_command():
+    """Show the number of mails in the outbox and the progress of mass mails."""
+    counts = db.session.execute(
+        db.select(OutboxMessage.status, db.func.count()).group_by(OutboxMessage.status)
+    ).all()
+    for status, count in sorted(counts):
+        click.echo(f"{status:>10}: {count}")
+
+    unfinished = db.session.scalars(
+        db.select(MassMail)
+        .where(
+            MassMail.id.in_(
+                db.select(OutboxMessage.mass_mail_id).where(
+                    OutboxMessage.status != OutboxMessage.SENT
+                )
+            )
+        )
+        .order_by(MassMail.id)
+    )
+    for mass_mail in unfinished:
+        click.echo(
+            f'Mass mail {mass_mail.id} "{mass_mail.subject}":'
+            f" {mass_mail.count_chunks(OutboxMessage.SENT)}"
+            f"/{mass_mail.count_chunks()} chunks sent,"
+            f" {mass_mail.count_chunks(OutboxMessage.FAILED)} failed"
+        )
+
+
+@mail_cli.command("process-bounces")
+@click.argument("path", type=click.Path(exists=True))
+@click.option("--delete", is_flag=True, help="Remove the processed bounces.")
+def process_bounces_command(path, delete):
+    """
+    Mark the addresses of permanent bounces as invalid.
+
+    PATH is a Maildir directory or an mbox file, mails to invalid
+    addresses are no longer sent.
+    """
+    box = open_mailbox(path)
+    box.lock()
+    try:
+        addresses, keys = collect_bounces(box)
+        n_updated = mark_invalid(addresses)
+
+        if delete:
+            for key in keys:
+                box.remove(key)
+            box.flush()
+    finally:
+        box.unlock()
+        box.close()
+
+    click.echo(
+        f"Found {len(keys)} bounces for {len(addresses)} addresses,"
+        f" marked {n_updated} persons as invalid"
+    )
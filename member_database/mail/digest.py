@@ -0,0 +1,63 @@
+"""
+Sending of the stored notifications as digest mails.
+
+Called regularly by the mail worker, a digest is sent once its oldest
+notification is older than ``NOTIFICATION_DIGEST_INTERVAL`` seconds.
+"""
+
+import logging
+from datetime import timedelta
+
+from flask import current_app, render_template
+
+from ..models import db
+from . import send_email
+from .models import Notification, utcnow
+
+log = logging.getLogger(__name__)
+
+
+def flush_digests(interval=None):
+    """Send all due digests, returns the number of digest mails"""
+    if interval is None:
+        interval = current_app.config["NOTIFICATION_DIGEST_INTERVAL"]
+
+    due = db.session.execute(
+        db.select(Notification.recipient, Notification.subject)
+        .group_by(Notification.recipient, Notification.subject)
+        .having(
+            db.func.min(Notification.created_at)
+            <= utcnow() - timedelta(seconds=interval)
+        )
+    ).all()
+
+    n_sent = 0
+    for recipient, subject in due:
+        notifications = db.session.scalars(
+            db.select(Notification)
+            .filter_by(recipient=recipient, subject=subject)
+            .order_by(Notification.created_at, Notification.id)
+        ).all()
+        ids = [n.id for n in notifications]
+
+        # another worker already sent this digest if not all rows are deleted
+        result = db.session.execute(
+            db.delete(Notification)
+            .where(Notification.id.in_(ids))
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount != len(ids):
+            db.session.rollback()
+            continue
+
+        send_email(
+            subject=f"{subject} ({len(notifications)})",
+            sender=current_app.config["MAIL_SENDER"],
+            recipients=[recipient],
+            body=render_template("mail/digest.txt", notifications=notifications),
+        )
+        db.session.commit()
+        log.info(f"Sent digest of {len(ids)} notifications to {recipient}")
+        n_sent += 1
+
+    return n_sent
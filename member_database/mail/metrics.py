@@ -0,0 +1,79 @@
+from flask import has_app_context
+
+from ..metrics import REGISTRY, Counter, Gauge, Histogram
+from ..models import db
+from .models import OutboxMessage, utcnow
+
+enqueued = Counter(
+    "mail_enqueued_total",
+    "Messages put into the outbox, mass mails count once per chunk",
+    ["kind"],
+)
+coalesced = Counter(
+    "mail_coalesced_total", "Mails not sent because an identical mail was sent"
+)
+skipped_invalid = Counter(
+    "mail_skipped_invalid_total", "Recipients skipped because their mails bounced"
+)
+sent = Counter("mail_sent_total", "Messages delivered to the SMTP server")
+retried = Counter("mail_retried_total", "Failed deliveries that will be retried")
+failed = Counter("mail_failed_total", "Messages given up on")
+recipients_refused = Counter(
+    "mail_recipients_refused_total", "Recipients refused by the SMTP server"
+)
+smtp_connect_seconds = Histogram(
+    "mail_smtp_connect_seconds", "Time to open and log into an SMTP connection"
+)
+smtp_send_seconds = Histogram(
+    "mail_smtp_send_seconds", "Time to transfer one message to the SMTP server"
+)
+senders_in_flight = Gauge(
+    "mail_senders_in_flight", "SMTP connections currently delivering a batch"
+)
+outbox_messages = Gauge(
+    "mail_outbox_messages", "Messages in the outbox by status", ["status"]
+)
+outbox_oldest_due_seconds = Gauge(
+    "mail_outbox_oldest_due_seconds",
+    "Age of the oldest message that is due for delivery",
+)
+
+STATUSES = (
+    OutboxMessage.PENDING,
+    OutboxMessage.SENDING,
+    OutboxMessage.SENT,
+    OutboxMessage.FAILED,
+)
+
+
+def collect_outbox():
+    """The outbox is shared by all processes, so its size is read from the database"""
+    if not has_app_context():
+        return
+
+    counts = dict(
+        db.session.execute(
+            db.select(OutboxMessage.status, db.func.count()).group_by(
+                OutboxMessage.status
+            )
+        ).all()
+    )
+    for status in STATUSES:
+        outbox_messages.set(counts.get(status, 0), status=status)
+
+    now = utcnow()
+    oldest = db.session.scalar(
+        db.select(db.func.min(OutboxMessage.created_at)).where(
+            OutboxMessage.status == OutboxMessage.PENDING,
+            OutboxMessage.next_attempt_at <= now,
+        )
+    )
+    # sqlite returns naive datetimes
+    if oldest is not None and oldest.tzinfo is None:
+        oldest = oldest.replace(tzinfo=now.tzinfo)
+    outbox_oldest_due_seconds.set(
+        (now - oldest).total_seconds() if oldest is not None else 0
+    )
+
+
+REGISTRY.collectors.append(collect_outbox)
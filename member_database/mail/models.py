@@ -0,0 +1,107 @@
+from datetime import datetime, timezone
+
+from ..models import db
+
+
+def utcnow():
+    return datetime.now(timezone.utc)
+
+
+class OutboxMessage(db.Model):
+    """
+    A mail waiting to be delivered by the mail worker (``flask mail worker``).
+
+    The message is stored fully encoded, together with the envelope,
+    so the worker does not need to know anything about how it was created.
+    Chunks of a `MassMail` share the message of the mass mail.
+    """
+
+    PENDING = "pending"
+    SENDING = "sending"
+    SENT = "sent"
+    FAILED = "failed"
+    STATES = (PENDING, SENDING, SENT, FAILED)
+
+    id = db.Column(db.Integer, primary_key=True)
+    created_at = db.Column(db.DateTime(timezone=True), nullable=False, default=utcnow)
+
+    subject = db.Column(db.UnicodeText)
+    sender = db.Column(db.UnicodeText, nullable=False)
+    recipients = db.Column(db.JSON, nullable=False)
+    message = db.Column(db.LargeBinary)
+
+    mass_mail_id = db.Column(db.Integer, db.ForeignKey("mass_mail.id"), index=True)
+    mass_mail = db.relationship(
+        "MassMail", backref=db.backref("chunks", lazy=True, order_by="OutboxMessage.id")
+    )
+
+    status = db.Column(db.String(16), nullable=False, default=PENDING)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(
+        db.DateTime(timezone=True), nullable=False, default=utcnow, index=True
+    )
+    claimed_at = db.Column(db.DateTime(timezone=True))
+    claim_token = db.Column(db.String(32), index=True)
+    sent_at = db.Column(db.DateTime(timezone=True))
+    last_error = db.Column(db.UnicodeText)
+    # identical mails share the same key, see `send_email`
+    dedupe_key = db.Column(db.String(255), index=True)
+
+    @property
+    def envelope(self):
+        message = self.message
+        if message is None:
+            message = self.mass_mail.message
+        if message is None:
+            message = self.mass_mail.path
+        return self.sender, self.recipients, message
+
+    def __repr__(self):
+        return f"<OutboxMessage {self.id}: {self.status}>"
+
+
+class Notification(db.Model):
+    """
+    A notification waiting to be sent as part of a digest mail,
+    all notifications with the same recipient and subject are sent together.
+    """
+
+    id = db.Column(db.Integer, primary_key=True)
+    created_at = db.Column(
+        db.DateTime(timezone=True), nullable=False, default=utcnow, index=True
+    )
+    recipient = db.Column(db.UnicodeText, nullable=False)
+    subject = db.Column(db.UnicodeText, nullable=False)
+    body = db.Column(db.UnicodeText, nullable=False)
+
+    def __repr__(self):
+        return f"<Notification {self.id} for {self.recipient}>"
+
+
+class MassMail(db.Model):
+    """
+    One message sent to many recipients.
+
+    The message is encoded only once, the recipients are split into chunks,
+    each chunk is delivered (and retried) as its own `OutboxMessage`.
+    Messages with attachments are not stored in the database but spooled
+    to a file at `path`, which is removed once all chunks are done.
+    """
+
+    id = db.Column(db.Integer, primary_key=True)
+    created_at = db.Column(db.DateTime(timezone=True), nullable=False, default=utcnow)
+    subject = db.Column(db.UnicodeText)
+    message = db.Column(db.LargeBinary)
+    path = db.Column(db.UnicodeText)
+
+    @property
+    def done(self):
+        return all(
+            c.status in (OutboxMessage.SENT, OutboxMessage.FAILED) for c in self.chunks
+        )
+
+    def count_chunks(self, status=None):
+        return sum(status is None or c.status == status for c in self.chunks)
+
+    def __repr__(self):
+        return f"<MassMail {self.id}: {self.subject}>"
@@ -0,0 +1,161 @@
+"""
+A minimal SMTP server accepting and storing every mail.
+
+Used as a local stand-in for the real relay in the tests and benchmarks.
+"""
+
+import socketserver
+import threading
+import time
+
+
+class SMTPSinkHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(line.encode("ascii") + b"\r\n")
+
+    def handle(self):
+        sink = self.server.sink
+        sink.count_connection()
+
+        if sink.connect_delay:
+            time.sleep(sink.connect_delay)
+
+        self.reply("220 localhost SMTP sink")
+        n_messages = 0
+        sender = None
+        recipients = []
+
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+
+            command = line.decode("ascii", "replace").strip()
+            verb = command[:4].upper()
+
+            if verb in ("EHLO", "HELO"):
+                self.reply("250 localhost")
+            elif verb == "MAIL":
+                sender = command.partition(":")[2].strip().strip("<>")
+                recipients = []
+                self.reply("250 OK")
+            elif verb == "RCPT":
+                recipient = command.partition(":")[2].strip().strip("<>")
+                if recipient in sink.refuse:
+                    self.reply(sink.refuse[recipient])
+                    continue
+                recipients.append(recipient)
+                self.reply("250 OK")
+            elif verb == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                lines = []
+                while True:
+                    data = self.rfile.readline()
+                    if not data:
+                        # connection lost, the message is discarded
+                        return
+                    if data in (b".\r\n", b".\n"):
+                        break
+                    # undo dot stuffing
+                    if data.startswith(b".."):
+                        data = data[1:]
+                    lines.append(data)
+                sink.store(sender, recipients, b"".join(lines))
+                n_messages += 1
+                self.reply("250 OK")
+
+                if (
+                    sink.max_messages_per_connection
+                    and n_messages >= sink.max_messages_per_connection
+                ):
+                    # simulate a server dropping the session
+                    return
+            elif verb == "RSET":
+                sender = None
+                recipients = []
+                self.reply("250 OK")
+            elif verb == "NOOP":
+                self.reply("250 OK")
+            elif verb == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Command not implemented")
+
+
+class ThreadingSMTPServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+class SMTPSink:
+    """
+    Local SMTP server running in a background thread.
+
+    Parameters
+    ----------
+    host: str
+    port: int
+        0 chooses a free port, see `SMTPSink.port`
+    connect_delay: float
+        Seconds to wait before greeting a new client, simulates TLS and login
+    max_messages_per_connection: int
+        Close the session after this many messages, simulates servers
+        dropping long running connections
+    keep_messages: bool
+        Store the received messages in `SMTPSink.messages`,
+        disable for long running benchmarks.
+    refuse: dict
+        Reply lines for recipients that are refused,
+        e.g. ``{"gone@example.org": "550 No such user"}``
+    """
+
+    def __init__(
+        self,
+        host="localhost",
+        port=0,
+        connect_delay=0,
+        max_messages_per_connection=None,
+        keep_messages=True,
+        refuse=None,
+    ):
+        self.connect_delay = connect_delay
+        self.refuse = dict(refuse or {})
+        self.max_messages_per_connection = max_messages_per_connection
+        self.keep_messages = keep_messages
+
+        self.messages = []
+        self.n_messages = 0
+        self.n_connections = 0
+        self._lock = threading.Lock()
+
+        self.server = ThreadingSMTPServer((host, port), SMTPSinkHandler)
+        self.server.sink = self
+        self.host, self.port = self.server.server_address[:2]
+        self._thread = None
+
+    def count_connection(self):
+        with self._lock:
+            self.n_connections += 1
+
+    def store(self, sender, recipients, message):
+        with self._lock:
+            self.n_messages += 1
+            if self.keep_messages:
+                self.messages.append((sender, recipients, message))
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.stop()
@@ -0,0 +1,186 @@
+"""
+Batched delivery of already encoded messages over reused SMTP connections.
+
+Opening a connection, the TLS handshake and the login are by far the most
+expensive part of sending a mail, so many messages are sent over one
+`mail.connect()` session.
+"""
+
+import logging
+import smtplib
+from io import DEFAULT_BUFFER_SIZE
+
+from flask import current_app
+
+from . import mail, metrics
+
+log = logging.getLogger(__name__)
+
+
+def send_data(host, f):
+    """Send the lines of `f` after DATA, including the final dot"""
+    buffer = []
+    size = 0
+    for line in f:
+        # dot stuffing, see RFC 5321 section 4.5.2
+        if line.startswith(b"."):
+            line = b"." + line
+        buffer.append(line)
+        size += len(line)
+        if size >= 16 * DEFAULT_BUFFER_SIZE:
+            host.send(b"".join(buffer))
+            buffer = []
+            size = 0
+
+    if buffer and not buffer[-1].endswith(b"\r\n"):
+        buffer.append(b"\r\n")
+    buffer.append(b".\r\n")
+    host.send(b"".join(buffer))
+
+
+def sendmail_file(host, sender, recipients, path):
+    """
+    Like `smtplib.SMTP.sendmail`, but stream the message from the file `path`,
+    which must use CRLF line endings, instead of loading it into memory.
+    """
+    # open the file first, so a missing spool file does not leave
+    # the connection in the middle of a transaction
+    with open(path, "rb") as f:
+        host.ehlo_or_helo_if_needed()
+
+        code, response = host.mail(sender)
+        if code != 250:
+            host.rset()
+            raise smtplib.SMTPSenderRefused(code, response, sender)
+
+        refused = {}
+        for recipient in recipients:
+            code, response = host.rcpt(recipient)
+            if code not in (250, 251):
+                refused[recipient] = (code, response)
+        if len(refused) == len(recipients):
+            host.rset()
+            raise smtplib.SMTPRecipientsRefused(refused)
+
+        code, response = host.docmd("data")
+        if code != 354:
+            host.rset()
+            raise smtplib.SMTPDataError(code, response)
+
+        try:
+            send_data(host, f)
+        except BaseException:
+            # the server would take a RSET as part of the message,
+            # the connection cannot be reused
+            host.close()
+            raise
+
+    code, response = host.getreply()
+    if code != 250:
+        host.rset()
+        raise smtplib.SMTPDataError(code, response)
+
+    return refused
+
+
+class BatchSender:
+    """
+    Send many messages over as few SMTP connections as possible.
+
+    The connection is opened lazily, renewed after `max_per_connection`
+    messages (``MAIL_MAX_EMAILS``) and reestablished once if the server
+    dropped the session.
+    """
+
+    def __init__(self, max_per_connection=None):
+        if max_per_connection is None:
+            max_per_connection = current_app.extensions["mail"].max_emails
+        self.max_per_connection = max_per_connection
+        self.connection = None
+        self.n_sent = 0
+        self.n_connects = 0
+
+    def connect(self):
+        self.close()
+        with metrics.smtp_connect_seconds.time():
+            connection = mail.connect()
+            connection.__enter__()
+        self.connection = connection
+        self.n_sent = 0
+        self.n_connects += 1
+
+    def close(self):
+        if self.connection is None:
+            return
+        connection, self.connection = self.connection, None
+        try:
+            connection.__exit__(None, None, None)
+        except (smtplib.SMTPException, OSError):
+            # the server might already have closed the connection
+            pass
+
+    def _sendmail(self, sender, recipients, message):
+        if not self.connection.host:
+            return {}
+
+        with metrics.smtp_send_seconds.time():
+            if isinstance(message, bytes):
+                return self.connection.host.sendmail(sender, recipients, message)
+            # path of a spooled message
+            return sendmail_file(self.connection.host, sender, recipients, message)
+
+    def send(self, sender, recipients, message):
+        """Returns the refused recipients, see `smtplib.SMTP.sendmail`"""
+        if self.connection is None or (
+            self.max_per_connection and self.n_sent >= self.max_per_connection
+        ):
+            self.connect()
+
+        try:
+            refused = self._sendmail(sender, recipients, message)
+        except smtplib.SMTPServerDisconnected:
+            log.info("SMTP server closed the connection, reconnecting")
+            self.connect()
+            refused = self._sendmail(sender, recipients, message)
+
+        self.n_sent += 1
+        return refused
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.close()
+
+
+def send_batch(envelopes, max_per_connection=None, throttle=None):
+    """
+    Send ``(sender, recipients, message)`` envelopes using one connection.
+    `message` is either the encoded message or the path to a spooled message.
+
+    `throttle` is called before each message and may block to limit the rate.
+
+    Returns a list with the exception for each failed message, None for
+    each successfully sent message and the dict of refused recipients
+    ``{recipient: (code, response)}`` for messages the server accepted
+    only for some of their recipients.
+    If the connection cannot be (re)established, all remaining messages
+    fail with the same exception.
+    """
+    errors = []
+    with BatchSender(max_per_connection=max_per_connection) as sender:
+        for envelope in envelopes:
+            if throttle is not None:
+                throttle()
+            try:
+                refused = sender.send(*envelope)
+            except Exception as e:
+                errors.append(e)
+                if sender.connection is None:
+                    # no connection, fail the rest of the batch with the same error
+                    errors.extend([e] * (len(envelopes) - len(errors)))
+                    break
+            else:
+                errors.append(refused or None)
+
+    return errors
@@ -0,0 +1,191 @@
+"""
+Spooling of mail attachments to disk.
+
+Uploaded attachments are streamed into a spool directory instead of being
+read into memory, the final message is then encoded from the spooled files
+into a single file which the mail worker streams to the SMTP server.
+"""
+
+import logging
+import os
+import shutil
+import tempfile
+from base64 import encodebytes
+from collections import namedtuple
+from email import message_from_bytes
+from email.generator import BytesGenerator
+from email.message import Message as EmailMessage
+from email.mime.base import MIMEBase
+from email.policy import compat32
+from email.utils import make_msgid
+
+from flask import current_app
+from flask_mail import Attachment
+
+log = logging.getLogger(__name__)
+
+SpooledAttachment = namedtuple(
+    "SpooledAttachment", ["path", "filename", "content_type"]
+)
+
+MESSAGE_FILENAME = "message.eml"
+CONTENT_HEADERS = {"content-type", "content-transfer-encoding", "mime-version"}
+CRLF = b"\r\n"
+POLICY = compat32.clone(linesep="\r\n")
+
+# 57 bytes are encoded into one line of 76 base64 characters
+ENCODE_CHUNK_SIZE = 57 * 1024
+
+
+def create_spool_dir():
+    spool_dir = current_app.config["MAIL_SPOOL_DIR"]
+    os.makedirs(spool_dir, exist_ok=True)
+    return tempfile.mkdtemp(dir=spool_dir)
+
+
+def remove_spool_dir(path):
+    """Remove the spool directory containing `path`"""
+    spool_dir = os.path.dirname(path)
+    shutil.rmtree(spool_dir, ignore_errors=True)
+    log.info(f"Removed mail spool {spool_dir}")
+
+
+def spool_uploads(files):
+    """
+    Stream uploaded files (werkzeug FileStorage) into a new spool directory.
+
+    Empty files are skipped. Returns a list of `SpooledAttachment`.
+    """
+    spool_dir = None
+    attachments = []
+
+    for f in files:
+        if f.filename == "":
+            continue
+
+        if spool_dir is None:
+            spool_dir = create_spool_dir()
+
+        # never use the user supplied filename for the path
+        path = os.path.join(spool_dir, f"attachment-{len(attachments)}")
+        f.save(path)
+
+        if os.path.getsize(path) == 0:
+            os.remove(path)
+            continue
+
+        attachments.append(SpooledAttachment(path, f.filename, f.mimetype))
+
+    if spool_dir is not None and len(attachments) == 0:
+        shutil.rmtree(spool_dir, ignore_errors=True)
+
+    return attachments
+
+
+def load_attachments(attachments):
+    """
+    Read spooled attachments into memory for flask-mail and remove the spool,
+    only used when mails are sent directly (testing and debug mode)
+    """
+    loaded = []
+    for attachment in attachments:
+        with open(attachment.path, "rb") as f:
+            data = f.read()
+        loaded.append(
+            Attachment(
+                filename=attachment.filename,
+                content_type=attachment.content_type,
+                data=data,
+            )
+        )
+
+    if attachments:
+        remove_spool_dir(attachments[0].path)
+    return loaded
+
+
+def write_base64(src, fp):
+    """
+    Base64 encode the file `src` into `fp` without reading it into memory.
+
+    Reading chunks instead of memory mapping the file keeps the resident
+    memory constant, mapped pages would count towards it.
+    """
+    with open(src, "rb") as f:
+        while chunk := f.read(ENCODE_CHUNK_SIZE):
+            fp.write(encodebytes(chunk).replace(b"\n", CRLF))
+
+
+def write_headers(part, fp):
+    """Write the headers of `part` followed by the empty separator line"""
+    BytesGenerator(fp, mangle_from_=False, policy=POLICY).flatten(part)
+
+
+def write_message(msg, attachments, path):
+    """
+    Encode the flask-mail Message `msg` together with the spooled
+    attachments into the file `path` as multipart/mixed message.
+
+    The attachments are encoded chunk by chunk, so memory usage does not
+    depend on their size.
+    """
+    # let flask-mail create the headers and the text part
+    text = message_from_bytes(msg.as_bytes(), policy=compat32)
+    boundary = "=====" + make_msgid().strip("<>").replace("@", "=") + "====="
+
+    outer = EmailMessage()
+    for key, value in text.items():
+        if key.lower() not in CONTENT_HEADERS:
+            outer[key] = value
+    outer["MIME-Version"] = "1.0"
+    outer["Content-Type"] = "multipart/mixed"
+    outer.set_boundary(boundary)
+    outer.set_payload("")
+
+    body = EmailMessage()
+    for key, value in text.items():
+        if key.lower() in CONTENT_HEADERS - {"mime-version"}:
+            body[key] = value
+    body.set_payload(text.get_payload())
+
+    delimiter = b"--" + boundary.encode("ascii")
+
+    with open(path, "wb") as fp:
+        write_headers(outer, fp)
+        fp.write(delimiter + CRLF)
+        BytesGenerator(fp, mangle_from_=False, policy=POLICY).flatten(body)
+        fp.write(CRLF)
+
+        for attachment in attachments:
+            part = MIMEBase(*attachment.content_type.split("/", 1))
+            part["Content-Transfer-Encoding"] = "base64"
+            filename = attachment.filename
+            try:
+                filename.encode("ascii")
+            except UnicodeEncodeError:
+                filename = ("UTF8", "", filename)
+            part.add_header("Content-Disposition", "attachment", filename=filename)
+            part.set_payload("")
+
+            fp.write(delimiter + CRLF)
+            write_headers(part, fp)
+            write_base64(attachment.path, fp)
+
+        fp.write(delimiter + b"--" + CRLF)
+
+    return path
+
+
+def spool_message(msg, attachments):
+    """
+    Write the message with its attachments into the spool directory
+    of the attachments and remove the then no longer needed attachment files.
+    Returns the path of the encoded message.
+    """
+    spool_dir = os.path.dirname(attachments[0].path)
+    path = write_message(msg, attachments, os.path.join(spool_dir, MESSAGE_FILENAME))
+
+    for attachment in attachments:
+        os.remove(attachment.path)
+
+    return path
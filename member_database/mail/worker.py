@@ -0,0 +1,264 @@
+"""
+Delivery of the mails stored in the outbox.
+
+Messages are claimed in batches by setting their status to ``sending``,
+so several workers can process the same outbox without sending a mail twice.
+Failed deliveries are not retried by sleeping, instead ``next_attempt_at``
+is pushed into the future using exponential backoff.
+"""
+
+import logging
+import smtplib
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from email.utils import parseaddr
+from uuid import uuid4
+
+from flask import current_app
+from sqlalchemy.orm import selectinload
+
+from ..models import db
+from ..ratelimit import TokenBucket
+from . import metrics
+from .backends import get_backend
+from .bounces import mark_invalid
+from .digest import flush_digests
+from .models import OutboxMessage, utcnow
+from .spool import remove_spool_dir
+
+log = logging.getLogger(__name__)
+
+
+def retry_delay(attempts, factor):
+    """Waiting time after the given number of failed attempts: 30, 60, 120 ... s"""
+    return timedelta(seconds=factor * 2 ** (attempts - 1))
+
+
+def release_stale_claims(claim_timeout):
+    """Make messages claimed by a crashed worker available again"""
+    result = db.session.execute(
+        db.update(OutboxMessage)
+        .where(
+            OutboxMessage.status == OutboxMessage.SENDING,
+            OutboxMessage.claimed_at < utcnow() - timedelta(seconds=claim_timeout),
+        )
+        .values(status=OutboxMessage.PENDING, claimed_at=None, claim_token=None)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    if result.rowcount:
+        log.warning(f"Released {result.rowcount} stale outbox claims")
+
+
+def claim_batch(batch_size):
+    """
+    Claim up to `batch_size` due messages for this worker.
+
+    The claim is a single conditional UPDATE, so concurrent workers
+    never claim the same message.
+    """
+    now = utcnow()
+    token = uuid4().hex
+
+    due = (
+        db.select(OutboxMessage.id)
+        .where(
+            OutboxMessage.status == OutboxMessage.PENDING,
+            OutboxMessage.next_attempt_at <= now,
+        )
+        .order_by(OutboxMessage.next_attempt_at, OutboxMessage.id)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    )
+    db.session.execute(
+        db.update(OutboxMessage)
+        .where(
+            OutboxMessage.id.in_(due.scalar_subquery()),
+            OutboxMessage.status == OutboxMessage.PENDING,
+        )
+        .values(status=OutboxMessage.SENDING, claimed_at=now, claim_token=token)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+
+    return db.session.scalars(
+        db.select(OutboxMessage)
+        .filter_by(claim_token=token)
+        .order_by(OutboxMessage.id)
+        # load the shared message of mass mail chunks only once
+        .options(selectinload(OutboxMessage.mass_mail))
+    ).all()
+
+
+def deliver(app, envelopes, throttle=None):
+    """
+    Send already encoded messages using the configured backend,
+    with smtp over one connection.
+    Returns the exception or None for each message.
+    """
+    with app.app_context(), metrics.senders_in_flight.track_inprogress():
+        return get_backend(app).send_batch(envelopes, throttle=throttle)
+
+
+def is_temporary(error):
+    """
+    Whether delivery might succeed later: connection problems and 4xx replies.
+    5xx replies, e.g. for unknown recipients, fail the message immediately.
+    """
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return any(400 <= code < 500 for code, _ in error.recipients.values())
+    if isinstance(error, (smtplib.SMTPConnectError, smtplib.SMTPAuthenticationError)):
+        # problems of the session, not of the message
+        return True
+    if isinstance(error, smtplib.SMTPResponseException):
+        return 400 <= error.smtp_code < 500
+    if isinstance(error, smtplib.SMTPServerDisconnected):
+        return True
+    if isinstance(error, smtplib.SMTPException):
+        return False
+    # all socket exceptions are subclasses of OSError,
+    # but a missing spool file will not come back
+    return isinstance(error, OSError) and not isinstance(
+        error, (FileNotFoundError, IsADirectoryError, NotADirectoryError)
+    )
+
+
+def permanently_refused(refused):
+    """Addresses of the ``{recipient: (code, response)}`` refused with 5xx"""
+    return {
+        parseaddr(recipient)[1].lower()
+        for recipient, (code, _) in refused.items()
+        if 500 <= code < 600
+    }
+
+
+def record_result(outbox_message, error, max_tries, retry_factor):
+    """
+    Update `outbox_message` with the result of `send_batch`.
+    Returns the addresses the server refused permanently.
+    """
+    outbox_message.attempts += 1
+    outbox_message.claimed_at = None
+    outbox_message.claim_token = None
+
+    if error is None or isinstance(error, dict):
+        outbox_message.status = OutboxMessage.SENT
+        outbox_message.sent_at = utcnow()
+        outbox_message.last_error = None
+        metrics.sent.inc()
+        log.info(f'Mail "{outbox_message.subject}" sent to {outbox_message.recipients}')
+        if not error:
+            return set()
+
+        # delivered, but not to all recipients
+        outbox_message.last_error = f"Refused recipients: {error!r}"
+        metrics.recipients_refused.inc(len(error))
+        log.warning(
+            f'Mail "{outbox_message.subject}" was refused for {sorted(error)}: {error!r}'
+        )
+        return permanently_refused(error)
+
+    outbox_message.last_error = repr(error)
+
+    if is_temporary(error) and outbox_message.attempts < max_tries:
+        delay = retry_delay(outbox_message.attempts, retry_factor)
+        outbox_message.status = OutboxMessage.PENDING
+        outbox_message.next_attempt_at = utcnow() + delay
+        metrics.retried.inc()
+        log.error(
+            f"Sending email {outbox_message.id} failed"
+            f" in {outbox_message.attempts} attempt,"
+            f" retrying in {delay.total_seconds():.1f} s: {error!r}"
+        )
+    else:
+        outbox_message.status = OutboxMessage.FAILED
+        metrics.failed.inc()
+        log.error(
+            f'Failed sending mail with subject "{outbox_message.subject}"'
+            f" to {outbox_message.recipients}: {error!r}"
+        )
+
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        metrics.recipients_refused.inc(len(error.recipients))
+        return permanently_refused(error.recipients)
+    return set()
+
+
+def process_outbox(batch_size=None, concurrency=None, rate_limit=None):
+    """
+    Claim one batch of due messages and deliver it using at most
+    `concurrency` parallel SMTP connections, each connection
+    is reused for its share of the batch.
+    `rate_limit` is a `TokenBucket` shared by all connections.
+
+    Returns the number of processed messages.
+    """
+    config = current_app.config
+    batch_size = batch_size or config["MAIL_WORKER_BATCH_SIZE"]
+    concurrency = concurrency or config["MAIL_WORKER_CONCURRENCY"]
+
+    release_stale_claims(config["MAIL_CLAIM_TIMEOUT"])
+    batch = claim_batch(batch_size)
+    if len(batch) == 0:
+        return 0
+
+    app = current_app._get_current_object()
+    throttle = rate_limit.wait if rate_limit is not None else None
+    shares = [batch[i::concurrency] for i in range(min(concurrency, len(batch)))]
+    with ThreadPoolExecutor(max_workers=len(shares)) as pool:
+        results = list(
+            pool.map(
+                lambda share: deliver(app, [m.envelope for m in share], throttle),
+                shares,
+            )
+        )
+
+    refused = set()
+    for share, errors in zip(shares, results):
+        for outbox_message, error in zip(share, errors):
+            refused |= record_result(
+                outbox_message,
+                error,
+                max_tries=config["MAIL_MAX_TRIES"],
+                retry_factor=config["MAIL_RETRY_FACTOR"],
+            )
+    db.session.commit()
+
+    # no further mails to addresses the server does not know, like bounces
+    if refused:
+        mark_invalid(refused)
+
+    # spooled messages are no longer needed once all chunks are done
+    for mass_mail in {m.mass_mail for m in batch if m.mass_mail is not None}:
+        if mass_mail.path is not None and mass_mail.done:
+            remove_spool_dir(mass_mail.path)
+            mass_mail.path = None
+    db.session.commit()
+
+    return len(batch)
+
+
+def run_worker(batch_size=None, concurrency=None, poll_interval=None, once=False):
+    """Process the outbox until interrupted"""
+    config = current_app.config
+    poll_interval = poll_interval or config["MAIL_WORKER_POLL_INTERVAL"]
+
+    rate_limit = None
+    if config["MAIL_RATE_LIMIT"]:
+        rate_limit = TokenBucket(config["MAIL_RATE_LIMIT"])
+
+    log.info("Mail worker started")
+
+    while True:
+        flush_digests()
+        n_processed = process_outbox(
+            batch_size=batch_size, concurrency=concurrency, rate_limit=rate_limit
+        )
+        # remove the session so the next batch does not see stale objects
+        db.session.remove()
+
+        if n_processed == 0:
+            if once:
+                break
+            time.sleep(poll_interval)
@@ -1,3 +1,4 @@
+import hmac
 from datetime import date
 
 from flask import (
@@ -6,6 +7,7 @@ from flask import (
     current_app,
     flash,
     jsonify,
+    make_response,
     redirect,
     render_template,
     request,
@@ -17,7 +19,8 @@ from sqlalchemy.exc import IntegrityError
 
 from .authentication import access_required
 from .forms import MembershipForm, PersonEditForm, RequestLinkForm
-from .mail import send_email
+from .mail import send_email, send_notification
+from .metrics import CONTENT_TYPE, REGISTRY
 from .models import MembershipStatus, MembershipType, Person, TUStatus, as_dict, db
 from .utils import ext_url_for, get_or_create, table_exists
 
@@ -166,6 +169,7 @@ def register():
                 url=ext_url_for("main.edit", token=token),
             ),
         )
+        db.session.commit()
 
         max_age = current_app.config["TOKEN_MAX_AGE"] // 60
         flash(
@@ -199,6 +203,7 @@ def request_edit():
                 edit_link=ext_url_for("main.edit", token=token),
             ),
         )
+        db.session.commit()
         flash("E-Mail mit Link für die Datenänderung verschickt", "success")
         return redirect(url_for("main.index"))
 
@@ -229,6 +234,7 @@ def request_gdpr_data():
                 data_link=ext_url_for("main.view_data", token=token),
             ),
         )
+        db.session.commit()
         flash("E-Mail mit Link für die Dateneinsicht verschickt", "success")
         return redirect(url_for("main.index"))
 
@@ -259,15 +265,14 @@ def edit(token):
         abort(404)
 
     if p.membership_status_id == MembershipStatus.EMAIL_UNVERIFIED:
-        send_email(
+        send_notification(
+            recipient=current_app.config["APPROVE_MAIL"],
             subject="Neuer Mitgliedsantrag",
-            sender=current_app.config["MAIL_SENDER"],
-            recipients=[current_app.config["APPROVE_MAIL"]],
-            body=render_template(
-                "mail/approve_member.txt",
-                new_member=p,
-                url=ext_url_for("main.applications"),
-            ),
+            template="mail/approve_member.txt",
+            digest_subject="Neue Mitgliedsanträge",
+            digest=current_app.config["APPROVE_MAIL_DIGEST"],
+            new_member=p,
+            url=ext_url_for("main.applications"),
         )
 
         p.membership_status_id = MembershipStatus.PENDING
@@ -344,6 +349,22 @@ def view_data(token):
     return jsonify(status="success", personal_data=personal_data)
 
 
+@main.route("/metrics")
+def metrics():
+    """Metrics of this process, requires ``Authorization: Bearer <METRICS_TOKEN>``"""
+    token = current_app.config["METRICS_TOKEN"]
+    if not token:
+        abort(404)
+
+    authorization = request.headers.get("Authorization", "")
+    if not hmac.compare_digest(authorization.encode(), f"Bearer {token}".encode()):
+        abort(401)
+
+    response = make_response(REGISTRY.render())
+    response.content_type = CONTENT_TYPE
+    return response
+
+
 @main.route("/applications")
 @access_required("member_management")
 def applications():
@@ -1,4 +1,5 @@
 from .base import as_dict, db
+from .cache_version import CacheVersion
 from .person import MembershipStatus, MembershipType, Person, TUStatus
 
 __all__ = [
@@ -8,4 +9,5 @@ __all__ = [
     "MembershipStatus",
     "TUStatus",
     "MembershipType",
+    "CacheVersion",
 ]
@@ -0,0 +1,15 @@
+from .base import db
+
+
+class CacheVersion(db.Model):
+    """
+    Version counter of cached data, incremented whenever the data changes,
+    so all processes can tell that their caches are stale,
+    see `member_database.cache.VersionedCache`.
+    """
+
+    name = db.Column(db.String(64), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<CacheVersion {self.name}: {self.version}>"
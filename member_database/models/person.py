@@ -25,7 +25,9 @@ class Person(db.Model):
     tu_status = db.relationship("TUStatus", backref="persons", lazy="subquery")
 
     email = db.Column(db.String(120), unique=True, nullable=False)
-    email_valid = db.Column(db.Boolean, default=False)
+    # None: not verified, True: verified by using a link sent to it,
+    # False: mails bounced (flask mail process-bounces)
+    email_valid = db.Column(db.Boolean, default=None)
 
     date_of_birth = db.Column(db.Date, nullable=True)
     joining_date = db.Column(db.Date, default=None, nullable=True)
@@ -0,0 +1,144 @@
+import threading
+import time
+from collections import deque
+
+from flask import current_app
+
+from .cache import TTLCache
+
+
+class TokenBucket:
+    """
+    Token bucket rate limiter.
+
+    Tokens are refilled continuously with `rate` tokens per second,
+    at most `capacity` tokens can be saved up for bursts.
+    Safe to share between threads.
+    """
+
+    def __init__(self, rate, capacity=None, clock=time.monotonic):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1)
+        self.clock = clock
+        self.tokens = self.capacity
+        self.updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def consume(self, tokens=1):
+        """Take `tokens` if available, returns whether that was the case"""
+        with self._lock:
+            self._refill()
+            if self.tokens >= tokens:
+                self.tokens -= tokens
+                return True
+            return False
+
+    def wait(self, tokens=1):
+        """Block until `tokens` could be taken"""
+        while True:
+            with self._lock:
+                self._refill()
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                delay = (tokens - self.tokens) / self.rate
+            time.sleep(delay)
+
+
+class KeyedRateLimiter:
+    """
+    One `TokenBucket` per key, e.g. per IP address.
+
+    Only the buckets of the `maxsize` most recently seen keys are kept.
+    """
+
+    def __init__(self, rate, capacity=None, maxsize=10000):
+        self.rate = rate
+        self.capacity = capacity
+        self.buckets = TTLCache(maxsize=maxsize)
+
+    def allow(self, key, tokens=1):
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = TokenBucket(self.rate, self.capacity)
+            if not self.buckets.add(key, bucket):
+                # another thread was faster
+                bucket = self.buckets.get(key, bucket)
+        return bucket.consume(tokens)
+
+
+def hourly_limit(name, key, per_hour):
+    """
+    Check whether `key` is still allowed to use `name` given a limit of
+    `per_hour` requests per hour, bursts up to the full hourly limit are allowed.
+    A limit of 0 disables limiting.
+    """
+    if not per_hour:
+        return True
+
+    limiters = current_app.extensions.setdefault("rate_limiters", {})
+    limiter = limiters.get((name, per_hour))
+    if limiter is None:
+        limiter = limiters.setdefault(
+            (name, per_hour), KeyedRateLimiter(per_hour / 3600, per_hour)
+        )
+    return limiter.allow(key)
+
+
+class AdmissionGate:
+    """
+    Admit at most `limit` concurrent callers, further callers wait in
+    the order they arrived. At most `max_waiting` callers wait,
+    the others are rejected immediately.
+    Safe to share between threads.
+    """
+
+    def __init__(self, limit, max_waiting=None):
+        self.limit = limit
+        self.max_waiting = max_waiting
+        self.active = 0
+        self.waiting = deque()
+        self._lock = threading.Lock()
+
+    def acquire(self, timeout=None):
+        """Wait up to `timeout` seconds for admission, returns whether admitted"""
+        with self._lock:
+            if self.active < self.limit and not self.waiting:
+                self.active += 1
+                return True
+            if self.max_waiting is not None and len(self.waiting) >= self.max_waiting:
+                return False
+            ticket = threading.Event()
+            self.waiting.append(ticket)
+
+        if ticket.wait(timeout):
+            return True
+
+        with self._lock:
+            # admitted between the timeout and taking the lock
+            if ticket.is_set():
+                return True
+            self.waiting.remove(ticket)
+            return False
+
+    def release(self):
+        with self._lock:
+            if self.waiting:
+                # pass the slot on directly, so nobody can overtake
+                self.waiting.popleft().set()
+            else:
+                self.active -= 1
+
+
+def admission_gate(name, key, limit, max_waiting):
+    """The `AdmissionGate` of `key` for `name`, shared by all threads of the app"""
+    gates = current_app.extensions.setdefault("admission_gates", {})
+    gate = gates.get((name, key))
+    if gate is None:
+        gate = gates.setdefault((name, key), AdmissionGate(limit, max_waiting))
+    return gate
@@ -1,3 +1,6 @@
+import hashlib
+import json
+
 from flask import current_app, url_for
 from sqlalchemy import inspect
 from sqlalchemy.sql.expression import ClauseElement
@@ -49,6 +52,21 @@ def ext_url_for(*args, **kwargs):
     )
 
 
+def read_only():
+    """
+    Declare the current transaction as read only on databases that
+    support it, writes fail until the transaction ends.
+    """
+    if db.session.get_bind().dialect.name == "postgresql":
+        db.session.execute(db.text("SET TRANSACTION READ ONLY"))
+
+
 def table_exists(model):
     """Check if table for given model already exists in db"""
     return inspect(db.engine).has_table(inspect(model).tables[0].name)
+
+
+def schema_hash(schema):
+    """Stable hash of a json schema, independent of the order of keys"""
+    data = json.dumps(schema, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
@@ -0,0 +1,32 @@
+"""Email valid is unknown until verified
+
+Revision ID: c1623177912d
+Revises: ffce15f4933a
+Create Date: 2026-10-18 18:18:10.448219
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "c1623177912d"
+down_revision = "ffce15f4933a"
+branch_labels = None
+depends_on = None
+
+
+person = sa.table("person", sa.column("email_valid", sa.Boolean()))
+
+
+def upgrade():
+    # False now means that mails to the address bounced
+    op.execute(
+        person.update().where(person.c.email_valid.is_(False)).values(email_valid=None)
+    )
+
+
+def downgrade():
+    op.execute(
+        person.update().where(person.c.email_valid.is_(None)).values(email_valid=False)
+    )
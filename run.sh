@@ -8,5 +8,25 @@ pg_dump "$DATABASE_URL" > /var/backups/$(date +"%Y-%m-%dT%H%M%S").sql
 # apply database migrations
 flask db upgrade
 
-# start the server
-gunicorn --bind 0.0.0.0:$PORT "member_database:create_app()"
+# deliver the mails of the outbox, set RUN_MAIL_WORKER=false
+# if the worker runs as a separate service
+worker=""
+if [ "${RUN_MAIL_WORKER:-true}" = "true" ]; then
+	flask mail worker &
+	worker=$!
+fi
+
+# start the server, requests are handled by GUNICORN_THREADS threads
+# per worker process, see REGISTRATION_CONCURRENCY in config.py
+gunicorn --bind 0.0.0.0:$PORT \
+	--worker-class gthread --threads "${GUNICORN_THREADS:-4}" \
+	"member_database:create_app()" &
+server=$!
+
+# stop both on docker stop, and the container if one of them exits
+trap 'kill $server $worker 2> /dev/null || true' TERM INT
+while kill -0 $server 2> /dev/null && { [ -z "$worker" ] || kill -0 $worker 2> /dev/null; }; do
+	sleep 1
+done
+kill $server $worker 2> /dev/null || true
+wait
@@ -1,3 +1,4 @@
+import pytest
 import wtforms
 
 
@@ -83,3 +84,51 @@ def test_subform():
     assert isinstance(form.languages.python, wtforms.BooleanField)
     assert isinstance(form.languages.other, wtforms.StringField)
     assert isinstance(form.name, wtforms.StringField)
+
+
+def test_cached_form():
+    from member_database.events.json_forms import cached_wtf_form
+
+    schema = dict(
+        type="object",
+        properties=dict(name=dict(type="string"), age=dict(type="integer")),
+    )
+    reordered = dict(
+        properties=dict(age=dict(type="integer"), name=dict(type="string")),
+        type="object",
+    )
+    calls = []
+
+    def additional_fields():
+        calls.append(1)
+        return {"email": wtforms.StringField("Email")}
+
+    Form = cached_wtf_form(schema, key="a", additional_fields=additional_fields)
+    assert (
+        cached_wtf_form(reordered, key="a", additional_fields=additional_fields) is Form
+    )
+    assert len(calls) == 1
+    assert isinstance(Form.email, wtforms.fields.core.UnboundField)
+
+    assert (
+        cached_wtf_form(schema, key="b", additional_fields=additional_fields)
+        is not Form
+    )
+    assert len(calls) == 2
+
+
+def test_cached_validator():
+    from jsonschema import SchemaError, ValidationError
+
+    from member_database.events.json_forms import get_validator, validate
+
+    schema = {"type": "object", "required": ["name"]}
+    validator = get_validator(schema)
+    assert get_validator(dict(schema)) is validator
+
+    validate({"name": "Richard"}, schema)
+    with pytest.raises(ValidationError):
+        validate({}, schema)
+
+    with pytest.raises(SchemaError):
+        get_validator({"type": "no-such-type"})
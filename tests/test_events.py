@@ -100,3 +100,792 @@ def test_event(client, endpoint, admin_user):
 
     ret = client.post("/logout/")
     assert ret.status_code == 302
+
+
+def test_resend_email(client, monkeypatch):
+    from member_database import db
+    from member_database.events import Event, EventRegistration, RegistrationStatus
+    from member_database.mail import mail
+    from member_database.models import Person
+
+    event = Event(name="Resend Event", registration_open=True, registration_schema={})
+    person = Person(name="Test User", email="resend@example.org")
+    registration = EventRegistration(
+        event=event,
+        person=person,
+        status=db.session.get(RegistrationStatus, "pending"),
+        data={},
+    )
+    db.session.add_all([event, person, registration])
+    db.session.commit()
+
+    # repeated clicks only result in a single mail
+    with mail.record_messages() as outbox:
+        for _ in range(3):
+            ret = client.post(
+                "/events/resend_email/",
+                data={"registration_id": registration.id},
+                follow_redirects=True,
+            )
+            assert ret.status_code == 200
+    assert len(outbox) == 1
+
+    monkeypatch.setitem(client.application.config, "RESEND_LIMIT_PER_ADDRESS", 1)
+    ret = client.post("/events/resend_emails/", data={"email": "resend@example.org"})
+    assert ret.status_code == 302
+    ret = client.post("/events/resend_emails/", data={"email": "resend@example.org"})
+    assert ret.status_code == 429
+
+
+def test_concurrent_confirmations(client):
+    from concurrent.futures import ThreadPoolExecutor
+    from threading import Barrier
+
+    from itsdangerous import URLSafeSerializer
+
+    from member_database import db
+    from member_database.events import Event, EventRegistration
+    from member_database.models import Person
+
+    app = client.application
+    n_registrations = 12
+    event = Event(
+        name="Rush Event",
+        registration_open=True,
+        max_participants=5,
+        registration_schema={},
+    )
+    registrations = [
+        EventRegistration(
+            event=event,
+            person=Person(name=f"Rush {i}", email=f"rush{i}@example.org"),
+            status_name="pending",
+            data={},
+        )
+        for i in range(n_registrations)
+    ]
+    db.session.add_all(registrations)
+    db.session.commit()
+
+    ts = URLSafeSerializer(app.config["SECRET_KEY"], salt="registration-key")
+    links = [
+        f"/events/registration/{ts.dumps((r.person_id, r.id))}/" for r in registrations
+    ]
+    barrier = Barrier(n_registrations)
+
+    def confirm(link):
+        with app.test_client() as c:
+            barrier.wait()
+            return c.get(link).status_code
+
+    with ThreadPoolExecutor(max_workers=n_registrations) as pool:
+        status_codes = list(pool.map(confirm, links))
+    assert status_codes == [200] * n_registrations
+
+    db.session.expire_all()
+    states = [r.status_name for r in registrations]
+    assert states.count("confirmed") == event.max_participants
+    assert states.count("waitinglist") == n_registrations - event.max_participants
+
+
+def test_registration_counters(client):
+    from member_database import db
+    from member_database.events import Event, EventRegistration
+    from member_database.models import Person
+
+    event = Event(name="Counter Event", registration_schema={})
+    registrations = [
+        EventRegistration(
+            event=event,
+            person=Person(name=f"Counter {i}", email=f"counter{i}@example.org"),
+            status_name="pending",
+            data={},
+        )
+        for i in range(3)
+    ]
+    db.session.add_all(registrations)
+    db.session.commit()
+    assert (event.n_pending, event.n_confirmed) == (3, 0)
+
+    registrations[0].status_name = "confirmed"
+    registrations[1].status_name = "waitinglist"
+    db.session.commit()
+    assert (event.n_pending, event.n_confirmed, event.n_waitinglist) == (1, 1, 1)
+
+    db.session.delete(registrations[2])
+    db.session.commit()
+    assert event.n_pending == 0
+
+    # changes bypassing the orm are repaired by the recount command
+    db.session.execute(
+        db.update(Event).where(Event.id == event.id).values(n_confirmed=42)
+    )
+    db.session.commit()
+
+    runner = client.application.test_cli_runner()
+    result = runner.invoke(args=["events", "recount", "--dry-run"])
+    assert "1 events have wrong counts" in result.output
+    result = runner.invoke(args=["events", "recount"])
+    assert result.exit_code == 0, result.output
+    assert "Repaired 1 events" in result.output
+
+    db.session.expire_all()
+    assert event.n_confirmed == 1
+
+
+def test_index_cache(client, monkeypatch):
+    import sys
+
+    from member_database import db
+    from member_database.events import Event
+    from member_database.models import Person
+
+    # member_database.events is shadowed by the blueprint
+    events_module = sys.modules["member_database.events"]
+    render_index = events_module.render_index
+    calls = []
+
+    def counting_render_index():
+        calls.append(1)
+        return render_index()
+
+    monkeypatch.setattr(events_module, "render_index", counting_render_index)
+
+    event = Event(name="Cached Event", registration_open=True, registration_schema={})
+    db.session.add(event)
+    db.session.commit()
+
+    for _ in range(3):
+        ret = client.get("/events/")
+        assert ret.status_code == 200
+        assert "Cached Event" in ret.data.decode("utf-8")
+    assert len(calls) == 1
+
+    # changes are visible immediately
+    event.name = "Renamed Event"
+    db.session.commit()
+    ret = client.get("/events/")
+    assert "Renamed Event" in ret.data.decode("utf-8")
+    assert len(calls) == 2
+
+    # unrelated changes do not invalidate the cache
+    db.session.add(Person(name="Unrelated", email="unrelated@example.org"))
+    db.session.commit()
+    client.get("/events/")
+    assert len(calls) == 2
+
+
+def test_event_cache(client):
+    from sqlalchemy import event as sa_event
+
+    from member_database import db
+    from member_database.events import Event
+    from member_database.events.cache import event_cache
+    from member_database.models import CacheVersion
+
+    event = Event(
+        name="Cached Event",
+        shortlink="cached",
+        registration_open=True,
+        registration_schema={},
+    )
+    db.session.add(event)
+    db.session.commit()
+    event_id = event.id
+    db.session.expunge(event)
+
+    statements = []
+
+    def count(conn, cursor, statement, *args):
+        if "FROM event" in statement:
+            statements.append(statement)
+
+    sa_event.listen(db.engine, "before_cursor_execute", count)
+    try:
+        for _ in range(3):
+            ret = client.get("/events/cached/")
+            assert ret.status_code == 200
+            assert ret.json["event"]["name"] == "Cached Event"
+        assert len(statements) == 2
+    finally:
+        sa_event.remove(db.engine, "before_cursor_execute", count)
+
+    assert client.get("/events/missing/").status_code == 404
+
+    # changes are visible immediately
+    db.session.get(Event, event_id).name = "Renamed Event"
+    db.session.commit()
+    assert client.get("/events/cached/").json["event"]["name"] == "Renamed Event"
+
+    # other processes only increment the version
+    db.session.execute(
+        db.update(Event).filter_by(id=event_id).values(name="Changed Elsewhere")
+    )
+    db.session.execute(
+        db.update(CacheVersion)
+        .filter_by(name="events")
+        .values(version=CacheVersion.version + 1)
+    )
+    db.session.commit()
+    # the version is checked again after check_interval
+    event_cache.expire()
+    assert client.get("/events/cached/").json["event"]["name"] == "Changed Elsewhere"
+
+
+def test_cache_version_after_commit(client):
+    from member_database import db
+    from member_database.events import Event
+    from member_database.models import CacheVersion
+
+    def version():
+        with db.engine.connect() as connection:
+            return connection.scalar(
+                db.select(CacheVersion.version).filter_by(name="events")
+            )
+
+    before = version()
+    db.session.add(Event(name="Version Event", registration_schema={}))
+    db.session.flush()
+    # the version is not touched within the transaction
+    assert version() == before
+    db.session.commit()
+    assert version() == before + 1
+
+    db.session.add(Event(name="Rolled Back Event", registration_schema={}))
+    db.session.flush()
+    db.session.rollback()
+    assert version() == before + 1
+
+
+def test_participants_export(client, admin_user):
+    import csv
+    import io
+    import json
+
+    from member_database import db
+    from member_database.events import Event, EventRegistration
+    from member_database.models import Person
+
+    event = Event(
+        name="Export Event",
+        shortlink="export",
+        registration_schema={
+            "type": "object",
+            "properties": {
+                "name": {"type": "string"},
+                "course": {"type": "string"},
+                "languages": {
+                    "type": "object",
+                    "properties": {
+                        "python": {"type": "boolean"},
+                        "other": {"type": "string"},
+                    },
+                },
+            },
+        },
+    )
+    db.session.add(event)
+    for i in range(3):
+        person = Person(name=f"Export {i}", email=f"export{i}@example.org")
+        db.session.add(
+            EventRegistration(
+                event=event,
+                person=person,
+                status_name="confirmed",
+                data={
+                    "name": f"Export {i}" if i < 2 else "=HYPERLINK(0)",
+                    "course": "Physik",
+                    "languages": {"python": i == 1},
+                },
+            )
+        )
+    db.session.commit()
+
+    assert client.get("/events/export/participants.csv").status_code == 401
+
+    ret = client.post("/login/", data=admin_user.login_data)
+    assert ret.status_code == 302
+
+    ret = client.get("/events/export/participants.csv")
+    assert ret.status_code == 200
+    assert ret.mimetype == "text/csv"
+    reader = csv.DictReader(io.StringIO(ret.data.decode("utf-8")))
+    rows = list(reader)
+    assert reader.fieldnames.count("name") == 1
+    assert len(rows) == 3
+    assert rows[1]["name"] == "Export 1"
+    assert rows[1]["email"] == "export1@example.org"
+    assert rows[1]["course"] == "Physik"
+    assert rows[1]["languages.python"] == "True"
+    assert rows[1]["languages.other"] == ""
+    # no formulas when opened in a spreadsheet
+    assert rows[2]["name"] == "'=HYPERLINK(0)"
+
+    ret = client.get(f"/events/{event.id}/participants.ndjson")
+    assert ret.status_code == 200
+    lines = [json.loads(line) for line in ret.data.decode("utf-8").splitlines()]
+    assert [p["data"]["email"] for p in lines] == [
+        f"export{i}@example.org" for i in range(3)
+    ]
+    assert lines[0]["status_name"] == "confirmed"
+
+    assert client.get("/events/12345/participants.csv").status_code == 404
+
+    with client.session_transaction() as session:
+        session["_flashes"] = [("info", "Flashed before streaming")]
+    ret = client.get("/events/export/participants/")
+    assert ret.status_code == 200
+    assert ret.is_streamed
+    assert "Flashed before streaming" in ret.get_data(as_text=True)
+    with client.session_transaction() as session:
+        assert "_flashes" not in session
+    html = ret.get_data(as_text=True)
+    assert all(f"export{i}@example.org" in html for i in range(3))
+    assert html.rstrip().endswith("</html>")
+
+    ret = client.post("/logout/")
+    assert ret.status_code == 302
+
+
+def test_participants_pagination(client, admin_user):
+    from datetime import datetime, timedelta, timezone
+
+    from member_database import db
+    from member_database.events import Event, EventRegistration
+    from member_database.models import Person
+
+    event = Event(name="Paginated Event", registration_schema={})
+    db.session.add(event)
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    for i in range(5):
+        db.session.add(
+            EventRegistration(
+                event=event,
+                person=Person(name=f"Page {i}", email=f"page{i}@example.org"),
+                status_name="pending" if i == 4 else "confirmed",
+                # two registrations with the same timestamp
+                timestamp=None if i == 4 else start + timedelta(minutes=i // 2),
+                data={},
+            )
+        )
+    db.session.commit()
+    ids = [r.id for r in event.registrations]
+
+    ret = client.post("/login/", data=admin_user.login_data)
+    assert ret.status_code == 302
+
+    url = f"/events/{event.id}/participants/"
+    headers = {"Accept": "application/json"}
+
+    # without limit, everything is returned as before
+    ret = client.get(url, headers=headers)
+    assert [p["id"] for p in ret.json["participants"]] == ids
+    assert "next" not in ret.json
+
+    seen = []
+    params = {"limit": 2}
+    while True:
+        ret = client.get(url, headers=headers, query_string=params)
+        assert ret.status_code == 200
+        seen.extend(p["id"] for p in ret.json["participants"])
+        if ret.json["next"] is None:
+            break
+        params["after"] = ret.json["next"]
+    assert seen == ids
+
+    ret = client.get(url, headers=headers, query_string={"status_name": "pending"})
+    assert [p["id"] for p in ret.json["participants"]] == ids[4:]
+
+    # only registrations changed since the last poll
+    since = datetime.now(timezone.utc)
+    registration = db.session.get(EventRegistration, ids[4])
+    registration.status_name = "confirmed"
+    db.session.commit()
+    ret = client.get(
+        url,
+        headers=headers,
+        query_string={"status_name": "confirmed", "changed_since": since.isoformat()},
+    )
+    assert [p["id"] for p in ret.json["participants"]] == ids[4:]
+
+    for params in ({"limit": 0}, {"after": "invalid"}, {"changed_since": "yesterday"}):
+        ret = client.get(url, headers=headers, query_string=params)
+        assert ret.status_code == 400
+
+    ret = client.post("/logout/")
+    assert ret.status_code == 302
+
+
+def test_cancel_promotes_waiting(client):
+    from datetime import datetime, timedelta, timezone
+
+    from itsdangerous import URLSafeSerializer
+
+    from member_database import db
+    from member_database.events import Event, EventRegistration
+    from member_database.mail import mail
+    from member_database.models import Person
+
+    app = client.application
+    event = Event(
+        name="Waitlist Event",
+        registration_open=True,
+        max_participants=1,
+        registration_schema={},
+    )
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    registrations = [
+        EventRegistration(
+            event=event,
+            person=Person(name=f"Waiting {i}", email=f"waiting{i}@example.org"),
+            status_name="confirmed" if i == 0 else "waitinglist",
+            # the waiting list is ordered by timestamp, not by id
+            timestamp=start + timedelta(minutes=[0, 2, 1][i]),
+            data={},
+        )
+        for i in range(3)
+    ]
+    db.session.add_all(registrations)
+    db.session.commit()
+
+    ts = URLSafeSerializer(app.config["SECRET_KEY"], salt="registration-key")
+    links = [
+        f"/events/registration/{ts.dumps((r.person_id, r.id))}/" for r in registrations
+    ]
+
+    ret = client.get(links[1])
+    assert "auf Platz 2" in ret.data.decode("utf-8")
+    ret = client.get(links[2])
+    assert "auf Platz 1" in ret.data.decode("utf-8")
+
+    # tokens of other registrations do not work
+    other = f"/events/registration/{ts.dumps((registrations[1].person_id, registrations[0].id))}/"
+    assert client.post(other + "cancel/").status_code == 404
+
+    with mail.record_messages() as outbox:
+        ret = client.post(links[0] + "cancel/")
+        assert ret.status_code == 302
+
+    db.session.expire_all()
+    assert [r.status_name for r in registrations] == [
+        "canceled",
+        "waitinglist",
+        "confirmed",
+    ]
+    assert event.n_confirmed == 1
+    assert event.n_waitinglist == 1
+    assert event.n_canceled == 1
+    assert [m.recipients for m in outbox] == [["waiting2@example.org"]]
+
+    ret = client.get(links[1])
+    assert "auf Platz 1" in ret.data.decode("utf-8")
+
+    # canceling a waiting registration does not promote anyone
+    with mail.record_messages() as outbox:
+        client.post(links[1] + "cancel/")
+        client.post(links[1] + "cancel/")
+    db.session.expire_all()
+    assert registrations[1].status_name == "canceled"
+    assert event.n_confirmed == 1
+    assert outbox == []
+
+    # canceled registrations cannot be changed anymore
+    data = dict(registrations[1].data)
+    ret = client.post(links[1], data={"name": "Changed"})
+    assert ret.status_code == 302
+    db.session.expire_all()
+    assert registrations[1].data == data
+    assert registrations[1].status_name == "canceled"
+
+
+def test_registration_admission(client, monkeypatch):
+    from member_database import db
+    from member_database.events import Event
+    from member_database.events.metrics import registrations_shed
+    from member_database.ratelimit import admission_gate
+
+    app = client.application
+    event = Event(name="Rush", registration_open=True, registration_schema={})
+    db.session.add(event)
+    db.session.commit()
+
+    for key, value in (
+        ("REGISTRATION_CONCURRENCY", 1),
+        ("REGISTRATION_QUEUE_SIZE", 0),
+        ("REGISTRATION_QUEUE_TIMEOUT", 0),
+        ("REGISTRATION_RETRY_AFTER", 7),
+    ):
+        monkeypatch.setitem(app.config, key, value)
+
+    gate = admission_gate("registration", event.id, 1, 0)
+    assert gate.acquire()
+    shed = registrations_shed.get()
+
+    url = f"/events/{event.id}/registration/"
+    assert client.get(url).status_code == 200
+    ret = client.post(url, data={"name": "Rush", "email": "rush@example.org"})
+    assert ret.status_code == 503
+    assert ret.headers["Retry-After"] == "7"
+    assert registrations_shed.get() == shed + 1
+
+    gate.release()
+    ret = client.post(url, data={"name": "Rush", "email": "rush@example.org"})
+    assert ret.status_code == 302
+    assert gate.active == 0
+
+
+def test_import_registrations(client, admin_user, tmp_path):
+    import io
+
+    from member_database import db
+    from member_database.authentication import AccessLevel
+    from member_database.events import Event
+    from member_database.mail import mail
+    from member_database.models import Person
+
+    app = client.application
+    event = Event(
+        name="Import Event",
+        shortlink="import",
+        max_participants=10,
+        registration_schema={
+            "type": "object",
+            "properties": {
+                "name": {"type": "string"},
+                "guests": {"type": "integer", "minimum": 1},
+                "languages": {
+                    "type": "object",
+                    "properties": {"python": {"type": "boolean"}},
+                },
+            },
+            "required": ["name", "guests"],
+        },
+    )
+    existing = Person(name="Existing", email="existing@example.org")
+    db.session.add_all([event, existing])
+    db.session.commit()
+
+    path = tmp_path / "invalid.csv"
+    path.write_text(
+        "name,email,guests,color\nA,a@example.org,1,red\n", encoding="utf-8"
+    )
+    runner = app.test_cli_runner()
+    result = runner.invoke(args=["events", "import", "import", str(path)])
+    assert result.exit_code == 1
+    assert "Unknown column 'color'" in result.output
+
+    path = tmp_path / "registrations.csv"
+    path.write_text(
+        "name,email,guests,languages.python\n"
+        "Import 1,import1@example.org,2,ja\n"
+        "Existing,existing@example.org,1,\n"
+        "Import 2,import2@example.org,0,nein\n",
+        encoding="utf-8",
+    )
+    result = runner.invoke(args=["events", "import", "import", str(path)])
+    assert result.exit_code == 1
+    assert "Line 4" in result.output
+    assert (
+        db.session.scalar(
+            db.select(db.func.count())
+            .select_from(Person)
+            .filter_by(email="import1@example.org")
+        )
+        == 0
+    )
+
+    # emails are matched ignoring case
+    path.write_text(
+        "name,email,guests,languages.python\n"
+        "Import 1,import1@example.org,2,ja\n"
+        "Existing,Existing@Example.org,1,\n",
+        encoding="utf-8",
+    )
+    result = runner.invoke(args=["events", "import", str(event.id), str(path)])
+    assert result.exit_code == 0, result.output
+    assert "Imported 2 registrations" in result.output
+
+    db.session.expire_all()
+    registrations = {r.person.email: r for r in event.registrations}
+    assert registrations["import1@example.org"].data == {
+        "name": "Import 1",
+        "guests": 2,
+        "languages": {"python": True},
+    }
+    assert registrations["existing@example.org"].person_id == existing.id
+    assert event.n_confirmed == 2
+
+    # upload in the web interface, already registered persons are skipped
+    role = admin_user.roles[0]
+    role.access_levels.append(db.session.get(AccessLevel, "import_registrations"))
+    db.session.commit()
+    ret = client.post("/login/", data=admin_user.login_data)
+    assert ret.status_code == 302
+
+    assert client.get("/events/import/import/").status_code == 200
+    csv_data = (
+        "name,email,guests\n"
+        "Import 1,import1@example.org,2\n"
+        "Import 3,import3@example.org,1\n"
+    )
+    with mail.record_messages() as outbox:
+        ret = client.post(
+            f"/events/{event.id}/import/",
+            data={
+                "file": (io.BytesIO(csv_data.encode("utf-8")), "import.csv"),
+                "status": "pending",
+                "send_mail": "y",
+            },
+        )
+    assert ret.status_code == 302
+    assert [m.recipients for m in outbox] == [["import3@example.org"]]
+
+    db.session.expire_all()
+    assert event.n_confirmed == 2
+    assert event.n_pending == 1
+    assert len(event.registrations) == 3
+
+    # confirmed registrations do not overbook the event
+    path.write_text(
+        "name,email,guests\n"
+        + "".join(f"Full {i},full{i}@example.org,1\n" for i in range(10)),
+        encoding="utf-8",
+    )
+    result = runner.invoke(args=["events", "import", "import", str(path)])
+    assert result.exit_code == 0, result.output
+    assert "2 were put on the waiting list" in result.output
+
+    db.session.expire_all()
+    assert event.n_confirmed == 10
+    assert event.n_waitinglist == 2
+    registrations = {r.person.email: r for r in event.registrations}
+    assert registrations["full7@example.org"].status_name == "confirmed"
+    assert registrations["full8@example.org"].status_name == "waitinglist"
+    assert registrations["full9@example.org"].status_name == "waitinglist"
+
+    # shortlinks consisting of digits are not taken for ids
+    digits = Event(
+        name="Digits Event",
+        shortlink=str(event.id),
+        registration_schema={
+            "type": "object",
+            "properties": {"name": {"type": "string"}},
+        },
+    )
+    db.session.add(digits)
+    db.session.commit()
+    path.write_text("name,email\nDigit,digit@example.org\n", encoding="utf-8")
+    result = runner.invoke(args=["events", "import", str(event.id), str(path)])
+    assert result.exit_code == 0, result.output
+    db.session.expire_all()
+    assert [r.person.email for r in digits.registrations] == ["digit@example.org"]
+
+    ret = client.post("/logout/")
+    assert ret.status_code == 302
+
+
+def test_get_event_etag(client):
+    from member_database import db
+    from member_database.events import Event, EventRegistration
+    from member_database.models import Person
+
+    event = Event(name="Public Event", registration_open=True, registration_schema={})
+    db.session.add(event)
+    db.session.commit()
+    url = f"/events/{event.id}/"
+
+    ret = client.get(url)
+    assert ret.status_code == 200
+    etag = ret.headers["ETag"]
+    assert not etag.startswith("W/")
+    assert "max-age=" in ret.headers["Cache-Control"]
+    assert "stale-while-revalidate=" in ret.headers["Cache-Control"]
+
+    ret = client.get(url, headers={"If-None-Match": etag})
+    assert ret.status_code == 304
+    assert ret.data == b""
+    assert ret.headers["ETag"] == etag
+
+    # new participants change the etag
+    db.session.add(
+        EventRegistration(
+            event=event,
+            person=Person(name="Public", email="public@example.org"),
+            status_name="confirmed",
+            data={},
+        )
+    )
+    db.session.commit()
+    ret = client.get(url, headers={"If-None-Match": etag})
+    assert ret.status_code == 200
+    assert ret.json["event"]["free_places"] is None
+    assert ret.headers["ETag"] != etag
+    etag = ret.headers["ETag"]
+
+    # as do changes of the event itself
+    event.name = "Renamed Public Event"
+    db.session.commit()
+    assert event.version == 2
+    ret = client.get(url, headers={"If-None-Match": etag})
+    assert ret.status_code == 200
+    assert ret.json["event"]["name"] == "Renamed Public Event"
+
+    ret = client.options(
+        url,
+        headers={
+            "Origin": "https://pep-dortmund.org",
+            "Access-Control-Request-Method": "GET",
+        },
+    )
+    assert ret.headers["Access-Control-Max-Age"] == str(24 * 3600)
+
+
+def test_confirmation_queries(client):
+    from itsdangerous import URLSafeSerializer
+    from sqlalchemy import event as sa_event
+
+    from member_database import db
+    from member_database.events import Event, EventRegistration
+    from member_database.models import Person
+
+    app = client.application
+    registration = EventRegistration(
+        event=Event(name="Revisited Event", registration_schema={}),
+        person=Person(name="Revisiting", email="revisiting@example.org"),
+        status_name="confirmed",
+        data={"name": "Revisiting"},
+    )
+    db.session.add(registration)
+    db.session.commit()
+
+    ts = URLSafeSerializer(app.config["SECRET_KEY"], salt="registration-key")
+    link = (
+        f"/events/registration/{ts.dumps((registration.person_id, registration.id))}/"
+    )
+    assert client.get(link).status_code == 200
+
+    statements = []
+    commits = []
+
+    def count(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    def count_commit(conn):
+        commits.append(conn)
+
+    sa_event.listen(db.engine, "before_cursor_execute", count)
+    sa_event.listen(db.engine, "commit", count_commit)
+    try:
+        ret = client.get(link)
+    finally:
+        sa_event.remove(db.engine, "before_cursor_execute", count)
+        sa_event.remove(db.engine, "commit", count_commit)
+
+    assert ret.status_code == 200
+    assert "Revisited Event" in ret.data.decode("utf-8")
+    assert len(statements) == 1
+    assert commits == []
+
+    # links with the wrong person do not work
+    link = f"/events/registration/{ts.dumps((registration.person_id + 1, registration.id))}/"
+    assert client.get(link).status_code == 404
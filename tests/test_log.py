@@ -0,0 +1,99 @@
+import logging
+import threading
+
+
+class BlockingHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+        self.unblock = threading.Event()
+
+    def emit(self, record):
+        self.unblock.wait(5)
+        self.records.append(record)
+
+
+def test_queued_handler():
+    from member_database.log import queued, records_dropped
+
+    dropped = records_dropped.get(level="ERROR")
+    target = BlockingHandler()
+    handler = queued(target, maxsize=2)
+    logger = logging.getLogger("test_queued_handler")
+    logger.propagate = False
+    logger.addHandler(handler)
+
+    try:
+        # the first record is taken by the listener, two fit into the queue
+        for i in range(10):
+            logger.error("record %d", i)
+
+        assert handler.dropped["ERROR"] in (7, 8)
+        assert records_dropped.get(level="ERROR") == dropped + handler.dropped["ERROR"]
+
+        target.unblock.set()
+        handler.listener.stop()
+
+        assert len(target.records) == 10 - handler.dropped["ERROR"]
+        assert target.records[0].getMessage() == "record 0"
+    finally:
+        target.unblock.set()
+        handler.listener.stop()
+        logger.removeHandler(handler)
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+def fail(logger):
+    try:
+        raise ConnectionError("database is gone")
+    except ConnectionError:
+        logger.exception("request failed")
+
+
+def test_digest_handler():
+    from member_database.log import DigestHandler
+
+    now = 0.0
+    target = ListHandler()
+    handler = DigestHandler(target, interval=600, clock=lambda: now)
+    logger = logging.getLogger("test_digest_handler")
+    logger.propagate = False
+    logger.addHandler(handler)
+
+    try:
+        for _ in range(100):
+            fail(logger)
+        logger.error("something else")
+
+        # only the first occurrence of each error is passed on directly
+        assert len(target.records) == 2
+        assert target.records[0].exc_info is not None
+
+        now += 600
+        handler.flush()
+        assert len(target.records) == 3
+        digest = target.records[2].getMessage()
+        assert "99 repeated log records" in digest
+        assert "99x ERROR test_digest_handler: request failed" in digest
+
+        # after the interval, the error is sent again directly
+        fail(logger)
+        assert len(target.records) == 4
+        handler.flush()
+        assert len(target.records) == 4
+
+        # old entries are also forgotten without a flush
+        now += 1200
+        logger.error("new problem")
+        assert len(handler.sent) == 1
+    finally:
+        logger.removeHandler(handler)
+        handler.close()
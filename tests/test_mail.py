@@ -0,0 +1,550 @@
+import email
+import io
+import os
+import smtplib
+from datetime import timedelta
+
+import pytest
+from flask_mail import Message
+
+
+def make_message(recipient="outbox@example.org", subject="Outbox Test"):
+    return Message(
+        subject=subject,
+        sender="sender@example.org",
+        recipients=[recipient],
+        body="Hello from the outbox",
+    )
+
+
+def test_enqueue(client):
+    from member_database.mail import OutboxMessage, enqueue
+    from member_database.models import db
+
+    outbox_message = enqueue(make_message())
+
+    outbox_message = db.session.get(OutboxMessage, outbox_message.id)
+    assert outbox_message.status == OutboxMessage.PENDING
+    assert outbox_message.attempts == 0
+    assert outbox_message.recipients == ["outbox@example.org"]
+    assert b"Hello from the outbox" in outbox_message.message
+
+    # the message is committed with the changes of the caller, or not at all
+    outbox_id = enqueue(make_message("rollback@example.org")).id
+    db.session.rollback()
+    assert db.session.get(OutboxMessage, outbox_id) is None
+
+
+def test_process_outbox(client):
+    from member_database.mail import OutboxMessage, enqueue
+    from member_database.mail.worker import process_outbox
+    from member_database.models import db
+
+    ids = [enqueue(make_message(f"worker{i}@example.org")).id for i in range(5)]
+
+    # mails are suppressed in the tests, so delivery always succeeds
+    while process_outbox(batch_size=2, concurrency=2) > 0:
+        pass
+
+    for id_ in ids:
+        outbox_message = db.session.get(OutboxMessage, id_)
+        assert outbox_message.status == OutboxMessage.SENT
+        assert outbox_message.attempts == 1
+        assert outbox_message.claim_token is None
+
+
+def test_retry(client, monkeypatch):
+    from member_database.mail import OutboxMessage, enqueue, worker
+    from member_database.models import db
+
+    def fail(app, envelopes, throttle=None):
+        error = smtplib.SMTPServerDisconnected("Connection unexpectedly closed")
+        return [error] * len(envelopes)
+
+    monkeypatch.setattr(worker, "deliver", fail)
+    monkeypatch.setitem(client.application.config, "MAIL_MAX_TRIES", 2)
+
+    id_ = enqueue(make_message("retry@example.org")).id
+    assert worker.process_outbox() == 1
+
+    outbox_message = db.session.get(OutboxMessage, id_)
+    assert outbox_message.status == OutboxMessage.PENDING
+    assert outbox_message.attempts == 1
+    assert "SMTPServerDisconnected" in outbox_message.last_error
+
+    # not due yet
+    assert worker.process_outbox() == 0
+
+    outbox_message.next_attempt_at -= timedelta(hours=1)
+    db.session.commit()
+    assert worker.process_outbox() == 1
+
+    outbox_message = db.session.get(OutboxMessage, id_)
+    assert outbox_message.status == OutboxMessage.FAILED
+    assert outbox_message.attempts == 2
+
+
+def test_permanent_failures(client, smtp_sink):
+    from member_database.mail import OutboxMessage, enqueue
+    from member_database.mail.worker import process_outbox
+    from member_database.models import db
+
+    smtp_sink.refuse = {
+        "gone@example.org": "550 5.1.1 No such user",
+        "full@example.org": "452 4.2.2 Mailbox full",
+    }
+    gone = enqueue(make_message("gone@example.org")).id
+    full = enqueue(make_message("full@example.org")).id
+    db.session.commit()
+    while process_outbox(batch_size=10, concurrency=1) > 0:
+        pass
+
+    # unknown recipients are not retried
+    outbox_message = db.session.get(OutboxMessage, gone)
+    assert outbox_message.status == OutboxMessage.FAILED
+    assert outbox_message.attempts == 1
+    assert "No such user" in outbox_message.last_error
+
+    outbox_message = db.session.get(OutboxMessage, full)
+    assert outbox_message.status == OutboxMessage.PENDING
+    assert outbox_message.attempts == 1
+
+
+def test_partially_refused(client, smtp_sink):
+    from member_database.mail import OutboxMessage, enqueue_mass_mail, metrics
+    from member_database.mail.worker import process_outbox
+    from member_database.models import Person, db
+
+    person = Person(name="Gone", email="Bcc-Gone@example.org")
+    db.session.add(person)
+    smtp_sink.refuse = {"bcc-gone@example.org": "550 5.1.1 No such user"}
+    refused = metrics.recipients_refused.get()
+
+    mass_mail = enqueue_mass_mail(
+        make_message("organizer@example.org", subject="Partially refused"),
+        [["bcc1@example.org", "Gone <bcc-gone@example.org>"]],
+    )
+    db.session.commit()
+    while process_outbox(batch_size=10, concurrency=1) > 0:
+        pass
+
+    # the mail is delivered to the other recipients, the refusal is recorded
+    [chunk] = db.session.get(type(mass_mail), mass_mail.id).chunks
+    assert chunk.status == OutboxMessage.SENT
+    assert "bcc-gone@example.org" in chunk.last_error
+    assert "No such user" in chunk.last_error
+    assert metrics.recipients_refused.get() == refused + 1
+    received = [r for _, r, m in smtp_sink.messages if b"Partially refused" in m]
+    assert received == [["organizer@example.org", "bcc1@example.org"]]
+
+    db.session.refresh(person)
+    assert person.email_valid is False
+
+
+def test_release_stale_claims(client):
+    from member_database.mail import enqueue
+    from member_database.mail.worker import claim_batch, release_stale_claims
+    from member_database.models import db
+
+    enqueue(make_message("stale@example.org"))
+    batch = claim_batch(100)
+    assert len(batch) > 0
+    assert claim_batch(100) == []
+
+    for outbox_message in batch:
+        outbox_message.claimed_at -= timedelta(hours=1)
+    db.session.commit()
+
+    release_stale_claims(claim_timeout=60)
+    assert len(claim_batch(100)) == len(batch)
+
+
+@pytest.fixture()
+def smtp_sink(app, monkeypatch):
+    """Deliver mails to a local SMTP server instead of suppressing them"""
+    from member_database.mail.sink import SMTPSink
+
+    with SMTPSink(max_messages_per_connection=3) as sink:
+        state = app.extensions["mail"]
+        monkeypatch.setattr(state, "suppress", False)
+        monkeypatch.setattr(state, "server", sink.host)
+        monkeypatch.setattr(state, "port", sink.port)
+        monkeypatch.setattr(state, "use_tls", False)
+        monkeypatch.setattr(state, "use_ssl", False)
+        monkeypatch.setattr(state, "username", None)
+        yield sink
+
+
+def test_send_batch(client, smtp_sink):
+    from member_database.mail.smtp import send_batch
+
+    envelopes = [
+        (
+            "sender@example.org",
+            [f"batch{i}@example.org"],
+            make_message(f"batch{i}@example.org").as_bytes(),
+        )
+        for i in range(10)
+    ]
+
+    # the sink drops every session after 3 messages, so we need to reconnect
+    errors = send_batch(envelopes)
+    assert errors == [None] * 10
+    assert smtp_sink.n_messages == 10
+    assert smtp_sink.n_connections == 4
+    assert [m[1] for m in smtp_sink.messages] == [e[1] for e in envelopes]
+
+    # reconnect regularly before the server drops the session
+    errors = send_batch(envelopes, max_per_connection=2)
+    assert errors == [None] * 10
+    assert smtp_sink.n_messages == 20
+    assert smtp_sink.n_connections == 4 + 5
+
+
+def test_send_batch_connection_refused(client, smtp_sink):
+    from member_database.mail.smtp import send_batch
+
+    smtp_sink.stop()
+    errors = send_batch([("sender@example.org", ["a@example.org"], b"")] * 3)
+    assert len(errors) == 3
+    assert all(isinstance(e, ConnectionRefusedError) for e in errors)
+
+
+def test_mass_mail(client, smtp_sink, monkeypatch):
+    from member_database.mail import OutboxMessage, enqueue_mass_mail
+    from member_database.mail.worker import process_outbox
+    from member_database.models import db
+
+    # only deliver the mass mail created here
+    db.session.execute(
+        db.update(OutboxMessage)
+        .where(OutboxMessage.status == OutboxMessage.PENDING)
+        .values(status=OutboxMessage.FAILED)
+    )
+    db.session.commit()
+
+    bcc = [f"participant{i}@example.org" for i in range(7)]
+    chunks = [bcc[:3], bcc[3:6], bcc[6:]]
+    mass_mail = enqueue_mass_mail(make_message("organizer@example.org"), chunks)
+
+    assert len(mass_mail.chunks) == 3
+    assert all(chunk.message is None for chunk in mass_mail.chunks)
+    assert mass_mail.chunks[0].recipients == ["organizer@example.org"] + bcc[:3]
+    assert mass_mail.chunks[1].recipients == bcc[3:6]
+
+    while process_outbox(concurrency=2) > 0:
+        pass
+
+    assert mass_mail.count_chunks(OutboxMessage.SENT) == 3
+    assert smtp_sink.n_messages == 3
+    received = sorted(r for _, recipients, _ in smtp_sink.messages for r in recipients)
+    assert received == sorted(["organizer@example.org"] + bcc)
+    # every chunk got the identical message
+    assert len({message for _, _, message in smtp_sink.messages}) == 1
+
+
+def test_send_mass_email_chunks(client, monkeypatch):
+    from member_database.mail import mail, send_mass_email
+
+    monkeypatch.setitem(client.application.config, "MAIL_BCC_CHUNK_SIZE", 2)
+    bcc = [f"chunk{i}@example.org" for i in range(5)]
+
+    with mail.record_messages() as outbox:
+        n_chunks = send_mass_email(
+            subject="Chunks",
+            sender="sender@example.org",
+            recipients=["organizer@example.org"],
+            bcc=bcc,
+            body="Hello everyone",
+        )
+
+    assert n_chunks == 3
+    assert [m.bcc for m in outbox] == [bcc[:2], bcc[2:4], bcc[4:]]
+    # like in the outbox, the visible recipients only get the first chunk
+    assert [sorted(m.send_to) for m in outbox] == [
+        ["chunk0@example.org", "chunk1@example.org", "organizer@example.org"],
+        ["chunk2@example.org", "chunk3@example.org"],
+        ["chunk4@example.org"],
+    ]
+    headers = [email.message_from_bytes(m.as_bytes()) for m in outbox]
+    assert [h["To"] for h in headers] == ["organizer@example.org"] * 3
+
+
+def spool_files(files):
+    from werkzeug.datastructures import FileStorage
+
+    from member_database.mail.spool import spool_uploads
+
+    return spool_uploads(
+        FileStorage(io.BytesIO(data), filename=name, content_type=content_type)
+        for name, content_type, data in files
+    )
+
+
+def test_send_batch_spool_errors(client, smtp_sink, monkeypatch, tmp_path):
+    from member_database.mail import smtp
+
+    path = tmp_path / "message.eml"
+    path.write_bytes(make_message("spool@example.org").as_bytes())
+    envelopes = [
+        ("sender@example.org", ["missing@example.org"], str(tmp_path / "missing")),
+        ("sender@example.org", ["spool@example.org"], str(path)),
+    ]
+
+    # the missing file is noticed before the transaction is started
+    errors = smtp.send_batch(envelopes)
+    assert isinstance(errors[0], FileNotFoundError)
+    assert errors[1] is None
+    assert smtp_sink.n_connections == 1
+    assert [m[1] for m in smtp_sink.messages] == [["spool@example.org"]]
+    assert b"Hello from the outbox" in smtp_sink.messages[0][2]
+
+    # errors in the middle of DATA close the connection
+    send_data = smtp.send_data
+    calls = []
+
+    def fail_once(host, f):
+        calls.append(f)
+        if len(calls) > 1:
+            return send_data(host, f)
+        host.send(b"Subject: broken\r\n")
+        raise OSError("read error")
+
+    monkeypatch.setattr(smtp, "send_data", fail_once)
+    errors = smtp.send_batch(envelopes[1:] * 2)
+    assert isinstance(errors[0], OSError)
+    assert errors[1] is None
+    assert smtp_sink.n_connections == 3
+    assert len(smtp_sink.messages) == 2
+    assert b"broken" not in smtp_sink.messages[1][2]
+
+
+def test_spooled_attachments(client, smtp_sink, monkeypatch, tmp_path):
+    from member_database.mail import MassMail, OutboxMessage, enqueue_mass_mail
+    from member_database.mail.worker import process_outbox
+    from member_database.models import db
+
+    monkeypatch.setitem(client.application.config, "MAIL_SPOOL_DIR", str(tmp_path))
+
+    pdf = os.urandom(300_000)
+    attachments = spool_files(
+        [
+            ("Übersicht.pdf", "application/pdf", pdf),
+            ("notes.txt", "text/plain", b".leading dot\r\n"),
+            ("empty.txt", "text/plain", b""),
+        ]
+    )
+    assert [a.filename for a in attachments] == ["Übersicht.pdf", "notes.txt"]
+
+    mass_mail = enqueue_mass_mail(
+        make_message("organizer@example.org", subject="Spooled"),
+        [["a@example.org"], ["b@example.org"]],
+        attachments,
+    )
+    assert mass_mail.message is None
+    path = mass_mail.path
+    # only the encoded message is left in the spool
+    assert os.listdir(os.path.dirname(path)) == ["message.eml"]
+
+    while process_outbox() > 0:
+        pass
+
+    mass_mail = db.session.get(MassMail, mass_mail.id)
+    assert mass_mail.count_chunks(OutboxMessage.SENT) == 2
+    assert mass_mail.path is None
+    assert not os.path.exists(os.path.dirname(path))
+
+    received = [m for _, _, m in smtp_sink.messages if b"Spooled" in m]
+    assert len(received) == 2
+    msg = email.message_from_bytes(received[0])
+    parts = [p for p in msg.walk() if not p.is_multipart()]
+    assert parts[0].get_payload(decode=True) == b"Hello from the outbox"
+    assert parts[1].get_filename() == "Übersicht.pdf"
+    assert parts[1].get_payload(decode=True) == pdf
+    assert parts[2].get_payload(decode=True) == b".leading dot\r\n"
+
+
+def test_spooled_attachments_testing(client, tmp_path, monkeypatch):
+    from member_database.mail import mail, send_mass_email
+
+    monkeypatch.setitem(client.application.config, "MAIL_SPOOL_DIR", str(tmp_path))
+    attachments = spool_files([("a.txt", "text/plain", b"attached")])
+
+    with mail.record_messages() as outbox:
+        send_mass_email(
+            subject="Attachments",
+            sender="sender@example.org",
+            recipients=["organizer@example.org"],
+            bcc=["participant@example.org"],
+            body="Hello",
+            spooled_attachments=attachments,
+        )
+
+    assert len(outbox) == 1
+    assert outbox[0].attachments[0].data == b"attached"
+    assert os.listdir(tmp_path) == []
+
+
+def test_metrics(client, monkeypatch):
+    from member_database.mail import enqueue, metrics
+    from member_database.mail.worker import process_outbox
+
+    sent = metrics.sent.get()
+    connects = metrics.smtp_connect_seconds.get_count()
+
+    enqueue(make_message("metrics@example.org"))
+    while process_outbox(batch_size=10, concurrency=1) > 0:
+        pass
+
+    assert metrics.sent.get() >= sent + 1
+    assert metrics.smtp_connect_seconds.get_count() >= connects + 1
+    assert metrics.senders_in_flight.get() == 0
+
+    monkeypatch.setitem(client.application.config, "METRICS_TOKEN", None)
+    assert client.get("/metrics").status_code == 404
+
+    monkeypatch.setitem(client.application.config, "METRICS_TOKEN", "secret")
+    assert client.get("/metrics").status_code == 401
+
+    ret = client.get("/metrics", headers={"Authorization": "Bearer secret"})
+    assert ret.status_code == 200
+    text = ret.data.decode("utf-8")
+    assert 'mail_outbox_messages{status="pending"}' in text
+    assert "mail_smtp_connect_seconds_bucket" in text
+
+
+def test_maildir_backend(client, monkeypatch, tmp_path):
+    import mailbox
+
+    from member_database.mail import OutboxMessage, enqueue
+    from member_database.mail.worker import process_outbox
+    from member_database.models import db
+
+    app = client.application
+    monkeypatch.setitem(app.config, "MAIL_BACKEND", "maildir")
+    monkeypatch.setitem(app.config, "MAIL_MAILDIR", str(tmp_path / "maildir"))
+    monkeypatch.delitem(app.extensions, "mail_backend", raising=False)
+
+    try:
+        outbox_message = enqueue(make_message("maildir@example.org"))
+        while process_outbox(batch_size=10, concurrency=2) > 0:
+            pass
+    finally:
+        app.extensions.pop("mail_backend", None)
+
+    outbox_message = db.session.get(OutboxMessage, outbox_message.id)
+    assert outbox_message.status == OutboxMessage.SENT
+
+    messages = list(mailbox.Maildir(tmp_path / "maildir"))
+    assert len(messages) == 1
+    assert messages[0]["X-Envelope-To"] == "maildir@example.org"
+    assert messages[0]["Subject"] == "Outbox Test"
+
+
+BOUNCE = """\
+From: MAILER-DAEMON@example.org
+To: sender@example.org
+Subject: Undelivered Mail Returned to Sender
+MIME-Version: 1.0
+Content-Type: multipart/report; report-type=delivery-status; boundary="BOUNDARY"
+
+--BOUNDARY
+Content-Type: text/plain
+
+This is the mail system. Your message could not be delivered.
+
+--BOUNDARY
+Content-Type: message/delivery-status
+
+Reporting-MTA: dns; mail.example.org
+
+Final-Recipient: rfc822; {permanent}
+Action: failed
+Status: 5.1.1
+
+Final-Recipient: rfc822; {temporary}
+Action: delayed
+Status: 4.4.1
+
+--BOUNDARY--
+"""
+
+
+def test_process_bounces(client, tmp_path):
+    import mailbox
+
+    from member_database.mail import mail, send_email
+    from member_database.models import Person, db
+
+    bounced = Person(name="Bounced", email="bounced@example.org")
+    delayed = Person(name="Delayed", email="delayed@example.org", email_valid=True)
+    db.session.add_all([bounced, delayed])
+    db.session.commit()
+
+    maildir = mailbox.Maildir(tmp_path / "bounces")
+    maildir.add(BOUNCE.format(permanent=bounced.email, temporary=delayed.email))
+    maildir.add("Subject: Not a bounce\n\nHello")
+
+    runner = client.application.test_cli_runner()
+    result = runner.invoke(
+        args=["mail", "process-bounces", str(tmp_path / "bounces"), "--delete"]
+    )
+    assert result.exit_code == 0, result.output
+    assert "Found 1 bounces for 1 addresses, marked 1 persons" in result.output
+    assert len(maildir) == 1
+
+    db.session.expire_all()
+    assert bounced.email_valid is False
+    assert delayed.email_valid is True
+
+    with mail.record_messages() as outbox:
+        for person in (bounced, delayed):
+            send_email(
+                subject="Bounce Test",
+                sender="sender@example.org",
+                recipients=[person.email],
+                body="Hello",
+            )
+    assert [m.recipients for m in outbox] == [[delayed.email]]
+
+
+def test_notification_digest(client):
+    from member_database.events import Event
+    from member_database.mail import Notification, mail, send_notification
+    from member_database.mail.digest import flush_digests
+    from member_database.models import Person, db
+
+    event = Event(
+        name="Digest Event",
+        notify_email="organizer@example.org",
+        notification_mode=Event.DIGEST,
+        registration_schema={},
+    )
+
+    with mail.record_messages() as outbox:
+        for i in range(3):
+            person = Person(name=f"Digest {i}", email=f"digest{i}@example.org")
+            registration = {"status_name": "confirmed"}
+            send_notification(
+                recipient=event.notify_email,
+                subject=f'Neue Anmeldung für "{event.name}"',
+                template="events/notification.txt",
+                digest_subject=f'Neue Anmeldungen für "{event.name}"',
+                digest=event.notification_mode == Event.DIGEST,
+                person=person,
+                event=event,
+                registration=registration,
+            )
+
+        assert len(outbox) == 0
+        assert flush_digests(interval=3600) == 0
+        assert flush_digests(interval=0) == 1
+
+    assert db.session.scalar(db.select(db.func.count(Notification.id))) == 0
+    assert len(outbox) == 1
+    digest = outbox[0]
+    assert digest.recipients == ["organizer@example.org"]
+    assert digest.subject == 'Neue Anmeldungen für "Digest Event" (3)'
+    assert digest.body.count("Hallo,") == 1
+    for i in range(3):
+        assert f"Digest {i} <digest{i}@example.org>" in digest.body
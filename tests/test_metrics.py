@@ -0,0 +1,24 @@
+def test_render():
+    from member_database.metrics import Counter, Gauge, Histogram, Registry
+
+    registry = Registry()
+    counter = Counter("requests_total", "Requests", ["path"], registry=registry)
+    gauge = Gauge("temperature", "Temperature", registry=registry)
+    histogram = Histogram("latency", "Latency", buckets=[0.5], registry=registry)
+
+    # large counters must not lose precision
+    counter.inc(12345678901, path="/")
+    gauge.set(0.1 + 0.2)
+    histogram.observe(0.25)
+    histogram.observe(1)
+
+    lines = registry.render().splitlines()
+    assert 'requests_total{path="/"} 12345678901' in lines
+    assert "temperature 0.30000000000000004" in lines
+    assert 'latency_bucket{le="0.5"} 1' in lines
+    assert 'latency_bucket{le="+Inf"} 2' in lines
+    assert "latency_sum 1.25" in lines
+    assert "latency_count 2" in lines
+
+    gauge.set(float("inf"))
+    assert "temperature +Inf" in registry.render().splitlines()
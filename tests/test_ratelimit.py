@@ -0,0 +1,93 @@
+def test_token_bucket():
+    from member_database.ratelimit import TokenBucket
+
+    now = 0.0
+    bucket = TokenBucket(rate=2, capacity=3, clock=lambda: now)
+
+    assert all(bucket.consume() for _ in range(3))
+    assert not bucket.consume()
+
+    now += 0.5
+    assert bucket.consume()
+    assert not bucket.consume()
+
+    # tokens do not accumulate above the capacity
+    now += 60
+    assert bucket.consume(3)
+    assert not bucket.consume()
+
+
+def test_ttl_cache():
+    from member_database.cache import TTLCache
+
+    now = 0.0
+    cache = TTLCache(maxsize=2, ttl=10, clock=lambda: now)
+
+    assert cache.add("a")
+    assert not cache.add("a")
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    # b was the least recently used entry
+    assert "b" not in cache
+    assert cache.get("c") == 3
+
+    now += 10
+    assert "a" not in cache
+    assert cache.add("a")
+
+
+def test_admission_gate():
+    import threading
+    import time
+
+    from member_database.ratelimit import AdmissionGate
+
+    gate = AdmissionGate(limit=1, max_waiting=2)
+    assert gate.acquire(timeout=0)
+    assert not gate.acquire(timeout=0.01)
+
+    admitted = []
+
+    def wait(i):
+        assert gate.acquire(timeout=5)
+        admitted.append(i)
+        gate.release()
+
+    threads = []
+    for i in range(2):
+        threads.append(threading.Thread(target=wait, args=(i,)))
+        threads[-1].start()
+        while len(gate.waiting) <= i:
+            time.sleep(0.001)
+
+    # the queue is full
+    assert not gate.acquire(timeout=None)
+
+    gate.release()
+    for thread in threads:
+        thread.join()
+    assert admitted == [0, 1]
+    assert gate.active == 0
+    assert gate.acquire(timeout=0)
+
+
+def test_proxy_fix(app):
+    from config import TestingConfig
+    from flask import request
+
+    from member_database import create_app
+
+    class ProxyConfig(TestingConfig):
+        PROXY_FIX_X_FOR = 1
+
+    headers = {"X-Forwarded-For": "198.51.100.7"}
+    for config, expected in (
+        (TestingConfig, "127.0.0.1"),
+        (ProxyConfig, "198.51.100.7"),
+    ):
+        proxied = create_app(config)
+        proxied.add_url_rule("/remote_addr", "remote_addr", lambda: request.remote_addr)
+        ret = proxied.test_client().get("/remote_addr", headers=headers)
+        assert ret.text == expected